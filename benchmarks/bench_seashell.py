@@ -0,0 +1,175 @@
+'''
+    Benchmark of the seashell pipeline outside of Modo and Blender.
+
+    The host APIs are replaced by the in-memory stand-ins of hosts.py and
+    every stage is measured for each combination of the profile size,
+    the sides per loop, the number of loops and the UV option:
+
+        capture   enumerate the profile polygons with PolygonVisitor
+        transform TransformProfile of the seashell kernel
+        topology  QuadIndices of the seashell kernel
+        uv        CornerUVs and UVTables of the seashell kernel
+        write     seashell.Write into the Modo stand-in mesh
+        stream    seashell.WriteStream of IterSweep chunks into the mesh
+        build     seashell.Build from capture to write
+        blender   SeaShell_Build of the Blender operator
+
+    Example:
+        python benchmarks/bench_seashell.py --nvert 16 64 --sides 20 100 --json bench.json
+'''
+
+import argparse
+import itertools
+import json
+import math
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, 'lib'), ROOT]
+
+import hosts
+hosts.InstallModo()
+hosts.InstallBlender()
+
+import seashell
+import seashell_core
+import bmesh_seashell
+
+
+'''
+    Make a circle profile of nvert vertices beside the Y axis.
+'''
+def CircleProfile(nvert, radius=0.5, center=1.5):
+    return [(center + radius * math.cos(2.0 * math.pi * k / nvert),
+             radius * math.sin(2.0 * math.pi * k / nvert),
+             0.0) for k in range(nvert)]
+
+
+def ModoMesh(profiles):
+    mesh = hosts.Mesh()
+    for profile in profiles:
+        mesh.AddProfile(profile)
+    return mesh
+
+
+def Capture(mesh):
+    vis = seashell.PolygonVisitor(hosts.Polygon(mesh), hosts.Point(mesh), 'Texture')
+    vis.polygon.Enumerate(None, vis, 0)
+    return vis
+
+
+'''
+    Run the stage repeat times and return the best wall time, then run it
+    once more with tracemalloc to count the memory blocks it left
+    allocated and its peak memory. setup makes fresh arguments for every
+    run and is not measured.
+'''
+def Measure(setup, run, repeat):
+    best = float('inf')
+    for i in range(repeat):
+        args = setup()
+        start = time.perf_counter()
+        run(*args)
+        best = min(best, time.perf_counter() - start)
+
+    args = setup()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = run(*args)
+    after = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+    del result
+    return {'time': best, 'blocks': blocks, 'peak': peak}
+
+
+def Stages(nprof, nvert, settings):
+    profiles = [CircleProfile(nvert) for i in range(nprof)]
+    profile = seashell_core.np.asarray(profiles[0])
+    n = settings.nsid * settings.nrep
+
+    def Prepare():
+        vis = Capture(ModoMesh(profiles))
+        jobs = seashell.Profiles(vis, settings)
+        sweeps = seashell_core.BuildSweeps([(p, s) for p, ids, type, s in jobs])
+        return vis, jobs, sweeps
+
+    def Write(vis, jobs, sweeps):
+        for (p, ids, type, s), sweep in zip(jobs, sweeps):
+            seashell.Write(vis, ids, type, s, sweep)
+
+    def PrepareStream():
+        vis = Capture(ModoMesh(profiles))
+        return vis, seashell.Profiles(vis, settings)
+
+    def Stream(vis, jobs):
+        for p, ids, type, s in jobs:
+            seashell.WriteStream(vis, ids, type, s, seashell_core.IterSweep(p, s))
+
+    def Blender():
+        bm = hosts.BMesh()
+        faces = [bm.AddProfile(p) for p in profiles]
+        op = bmesh_seashell.MESH_OT_SeaShell()
+        op.axis, op.nrep, op.sides = 'XYZ'[settings.axis], settings.nrep, settings.nsid
+        op.offset, op.scale, op.uvs = settings.off, settings.scl, settings.uvs
+        op.uwrp, op.vwrp, op.vrot, op.uv_map_name = settings.uwrp, settings.vwrp, settings.vrot, 'UVMap'
+        return op, bm, faces
+
+    def BlenderBuild(op, bm, faces):
+        for face in faces:
+            op.SeaShell_Build(bm, face, settings)
+
+    stages = [
+        ('capture', lambda: (ModoMesh(profiles),), Capture),
+        ('transform', lambda: (), lambda: seashell_core.TransformProfile(profile, settings)),
+        ('topology', lambda: (), lambda: seashell_core.QuadIndices(n, nvert)),
+    ]
+    if settings.uvs:
+        stages.append(('uv', lambda: (), lambda: (seashell_core.CornerUVs(n, nvert, settings),
+                                                  seashell_core.UVTables(n, nvert, settings))))
+    stages += [
+        ('write', Prepare, Write),
+        ('stream', PrepareStream, Stream),
+        ('build', lambda: (Capture(ModoMesh(profiles)),), lambda vis: seashell.Build(vis, settings)),
+        ('blender', Blender, BlenderBuild),
+    ]
+    return stages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the seashell pipeline with host stand-ins.")
+    parser.add_argument('--nvert', type=int, nargs='+', default=[16, 64], help="vertices per profile")
+    parser.add_argument('--nprof', type=int, default=1, help="number of profile polygons")
+    parser.add_argument('--sides', type=int, nargs='+', default=[20, 100], help="sides per loop")
+    parser.add_argument('--nrep', type=int, nargs='+', default=[4, 20], help="number of loops")
+    parser.add_argument('--uvs', type=int, nargs='+', default=[0, 1], help="make UVs (0 or 1)")
+    parser.add_argument('--stages', nargs='+', help="only run these stages")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per stage")
+    parser.add_argument('--json', help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = []
+    print("{:>6} {:>6} {:>5} {:>4} {:<10} {:>10} {:>9} {:>11}".format(
+        'nvert', 'sides', 'nrep', 'uvs', 'stage', 'time[ms]', 'blocks', 'peak[KiB]'))
+    for nvert, nsid, nrep, uvs in itertools.product(args.nvert, args.sides, args.nrep, args.uvs):
+        settings = seashell_core.Settings(nsid=nsid, nrep=nrep, uvs=bool(uvs))
+        for name, setup, run in Stages(args.nprof, nvert, settings):
+            if args.stages and name not in args.stages:
+                continue
+            result = Measure(setup, run, args.repeat)
+            result.update(stage=name, nvert=nvert, nprof=args.nprof, sides=nsid, nrep=nrep, uvs=bool(uvs))
+            results.append(result)
+            print("{:>6} {:>6} {:>5} {:>4} {:<10} {:>10.2f} {:>9} {:>11.1f}".format(
+                nvert, nsid, nrep, uvs, name, result['time'] * 1000.0, result['blocks'], result['peak'] / 1024.0))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
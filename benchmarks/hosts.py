@@ -0,0 +1,187 @@
+'''
+    Lightweight in-memory stand-ins for the parts of the Modo and Blender
+    APIs used by the seashell plug-ins, so the pipeline can be measured
+    without a running host. They only record what is written and do
+    not try to behave like the real meshes beyond that.
+'''
+
+import sys
+import types
+
+
+'''
+    Modo stand-ins
+'''
+class Storage(list):
+    def __init__(self, type='f', size=2):
+        list.__init__(self, [0] * size)
+
+    def setType(self, type):
+        pass
+
+    def setSize(self, size):
+        self[:] = [0] * size
+
+    def set(self, values):
+        self[:len(values)] = values
+
+
+class Mesh(object):
+    def __init__(self):
+        self.points = []
+        self.polygons = []
+        self.types = []
+        self.selected = []
+        self.point_map = {}
+        self.polygon_map = {}
+
+    def AddProfile(self, positions):
+        ids = []
+        for pos in positions:
+            self.points.append(tuple(pos))
+            ids.append(len(self.points) - 1)
+        self.polygons.append(ids)
+        self.types.append('FACE')
+        self.selected.append(len(self.polygons) - 1)
+
+
+class Point(object):
+    def __init__(self, mesh):
+        self.mesh = mesh
+        self.id = None
+
+    def Select(self, pointID):
+        self.id = pointID
+
+    def Pos(self):
+        return self.mesh.points[self.id]
+
+    def New(self, pos):
+        self.mesh.points.append(tuple(pos))
+        return len(self.mesh.points) - 1
+
+    def SetMapValue(self, map, value):
+        self.mesh.point_map[self.id] = (value[0], value[1])
+
+
+class Polygon(object):
+    def __init__(self, mesh):
+        self.mesh = mesh
+        self.id = None
+
+    def Select(self, polygonID):
+        self.id = polygonID
+
+    def ID(self):
+        return self.id
+
+    def Type(self):
+        return self.mesh.types[self.id]
+
+    def VertexCount(self):
+        return len(self.mesh.polygons[self.id])
+
+    def VertexByIndex(self, index):
+        return self.mesh.polygons[self.id][index]
+
+    def NewProto(self, type, points, nPoints, rev):
+        self.mesh.polygons.append(list(points[:nPoints]))
+        self.mesh.types.append(type)
+        return len(self.mesh.polygons) - 1
+
+    def SetMapValue(self, pointID, map, value):
+        self.mesh.polygon_map[(self.id, pointID)] = (value[0], value[1])
+
+    def Enumerate(self, mode, visitor, monitor):
+        for polygonID in self.mesh.selected:
+            self.Select(polygonID)
+            visitor.vis_Evaluate()
+
+
+'''
+    Install the Modo stand-ins as the lx and lxifc modules.
+'''
+def InstallModo():
+    lx = types.ModuleType('lx')
+    lx.object = types.SimpleNamespace(storage=Storage)
+    lxifc = types.ModuleType('lxifc')
+    lxifc.Visitor = type('Visitor', (object,), {})
+    lxifc.UIValueHints = type('UIValueHints', (object,), {})
+    sys.modules.setdefault('lx', lx)
+    sys.modules.setdefault('lxifc', lxifc)
+
+
+'''
+    Blender stand-ins
+'''
+class BMVert(object):
+    __slots__ = ('co',)
+
+    def __init__(self, co):
+        self.co = tuple(co)
+
+
+class BMLoop(object):
+    __slots__ = ('vert', 'layers')
+
+    def __init__(self, vert):
+        self.vert = vert
+        self.layers = {}
+
+    def __getitem__(self, layer):
+        return self.layers.setdefault(layer, types.SimpleNamespace(uv=(0.0, 0.0)))
+
+
+class BMFace(object):
+    __slots__ = ('verts', 'loops', 'select')
+
+    def __init__(self, verts):
+        self.verts = verts
+        self.loops = [BMLoop(v) for v in verts]
+        self.select = False
+
+
+class BMVertSeq(list):
+    def new(self, co):
+        vert = BMVert(co)
+        self.append(vert)
+        return vert
+
+
+class BMFaceSeq(list):
+    def new(self, verts):
+        if len(set(map(id, verts))) != len(verts):
+            raise ValueError("faces.new(verts): found duplicate verts")
+        face = BMFace(list(verts))
+        self.append(face)
+        return face
+
+
+class BMesh(object):
+    def __init__(self):
+        self.verts = BMVertSeq()
+        self.faces = BMFaceSeq()
+        uv = types.SimpleNamespace(verify=lambda: 'UVMap')
+        self.loops = types.SimpleNamespace(layers=types.SimpleNamespace(uv=uv))
+
+    def AddProfile(self, positions):
+        face = self.faces.new([self.verts.new(co) for co in positions])
+        face.select = True
+        return face
+
+
+'''
+    Install the Blender stand-ins as the bpy and bmesh modules.
+'''
+def InstallBlender():
+    bpy = types.ModuleType('bpy')
+    bpy.types = types.SimpleNamespace(Operator=object)
+    prop = lambda **kwargs: None
+    bpy.props = types.ModuleType('bpy.props')
+    for name in ('BoolProperty', 'FloatProperty', 'EnumProperty', 'IntProperty', 'StringProperty'):
+        setattr(bpy.props, name, prop)
+    bpy.app = types.SimpleNamespace(version=(4, 0, 0))
+    bmesh = types.ModuleType('bmesh')
+    sys.modules.setdefault('bpy', bpy)
+    sys.modules.setdefault('bpy.props', bpy.props)
+    sys.modules.setdefault('bmesh', bmesh)
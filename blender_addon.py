@@ -0,0 +1,45 @@
+'''
+    Package the Blender operator as a multi-file add-on, which can be
+    installed by "Install..." in the Add-ons tab of the Blender
+    preferences.
+
+    The zip holds a "seashell" folder with bmesh_seashell.py as its
+    __init__.py and the seashell kernel beside it, so the add-on does not
+    need the lib folder of this kit.
+
+    Example:
+        python blender_addon.py -o seashell_blender.zip
+'''
+
+import argparse
+import os
+import zipfile
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+'''
+    Map the name of every file of the add-on in the zip to its source
+    in this kit.
+'''
+ADDON_FILES = (
+    ("seashell/__init__.py", os.path.join(ROOT, "bmesh_seashell.py")),
+    ("seashell/seashell_core.py", os.path.join(ROOT, "lib", "seashell_core.py")),
+)
+
+
+def Package(path):
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, source in ADDON_FILES:
+            archive.write(source, name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Package the seashell Blender add-on.")
+    parser.add_argument('-o', '--output', default="seashell_blender.zip", help="zip file to write")
+    args = parser.parse_args(argv)
+    Package(args.output)
+    print(args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,25 @@
     a source profile polygon using Python script.
 '''
 
-import math
+import os
+import sys
 import bpy
 import bmesh
+import numpy
+
+'''
+    The kernel is beside this file when it is installed as the add-on
+    packaged by blender_addon.py, and in the lib folder of the kit when
+    this is run as a script.
+'''
+if __package__:
+    from . import seashell_core
+else:
+    try:
+        import seashell_core
+    except ImportError:
+        sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "lib"))
+        import seashell_core
 
 from bpy.props import BoolProperty, FloatProperty, EnumProperty, IntProperty, StringProperty
 
@@ -88,96 +104,201 @@ class MESH_OT_SeaShell(bpy.types.Operator):
         description="Texture UV name.",
         default='UVMap',
     )
+    weld: FloatProperty(
+        name="Weld Tolerance",
+        description="Weld the rings shrinking within this distance into a point. Zero disables welding.",
+        min=0.0,
+        default=0.0,
+    )
+    adapt: FloatProperty(
+        name="Adaptive Tolerance",
+        description="Chord tolerance of the adaptive tessellation. The slices are spaced so the rings stay within this distance of the true spiral. Zero keeps all sides.",
+        min=0.0,
+        default=0.0,
+    )
+    cap: EnumProperty(
+        name="Caps",
+        description="Close the last ring of the sweep. The profile face is the start cap.",
+        default='none',
+        items=[
+            ('none', "None", "Leave the last ring open"),
+            ('ngon', "N-gon", "Close the last ring with a single face"),
+            ('fan', "Fan", "Close the last ring with triangles around its center"),
+            ('point', "Point", "Collapse the last ring into its center")
+        ]
+    )
+    lods: IntProperty(
+        name="Levels of Detail",
+        description="Number of levels of detail. The levels after the first are made as new objects with half and quarter of the slices and a decimated profile.",
+        min=1,
+        max=len(seashell_core.LOD_CHAIN),
+        default=1,
+    )
+    bulk: BoolProperty(
+        name="Bulk Build",
+        description="Write all polygons to the mesh at once.",
+        default=True,
+    )
+    budget: IntProperty(
+        name="Point Budget",
+        description="Largest number of new points the sweeps may make. Zero disables the budget.",
+        min=0,
+        default=seashell_core.EnvironmentBudget().points,
+    )
+    budget_policy: EnumProperty(
+        name="Over Budget",
+        description="What to do when the sweeps would make more points than the budget.",
+        default=seashell_core.EnvironmentBudget().policy,
+        items=[
+            ('refuse', "Refuse", "Do not build the sweeps"),
+            ('warn', "Warn", "Build the sweeps and report a warning"),
+            ('clamp', "Clamp", "Reduce the sides per loop to fit the budget")
+        ]
+    )
 
-    def SeaShell_Build(self, bm, face):
-        front_p = []
-        verts = []
-        for v in face.verts:
-            front_p.append(v)
-            verts.append(v.co)
-
-        if self.scale < 1.0e-6:
-            scl = 1.0e-6
+    def SeaShell_Settings(self):
+        return seashell_core.Settings(
+            axis = 'XYZ'.index(self.axis),
+            nrep = self.nrep,
+            nsid = self.sides,
+            off = self.offset,
+            uvs = self.uvs,
+            uwrp = self.uwrp,
+            vwrp = self.vwrp,
+            scl = self.scale,
+            vrot = self.vrot,
+            name = self.uv_map_name,
+            weld = self.weld,
+            adapt = self.adapt,
+            cap = self.cap)
+
+    '''
+        Build the sweep of a face into the BMesh chunk by chunk, so only
+        the arrays of one slice are held at a time. A sweep built before
+        is written as a single chunk. The polygons are validated before
+        they are made, and the number of left out ones is returned.
+    '''
+    def SeaShell_Build(self, bm, face, settings, sweep=None):
+        front_p = list(face.verts)
+        nvert = len(front_p)
+        if sweep is None:
+            chunks = seashell_core.IterSweep([v.co[:] for v in front_p], settings)
         else:
-            scl = self.scale
-        n   = self.sides * self.nrep
-        rot = math.pi / self.sides
-        cen = self.offset / scl
-        scl = math.pow(scl, 1.0 / self.sides)
-        sc  = 1.0
-        rt  = 0.0
-
-        back_p = []
-
-        usiz = n * self.uwrp
-
-        nvert = len(face.verts)
+            chunks = [sweep]
 
-        quads = []
+        if self.uvs:
+            uv_layer = bm.loops.layers.uv.verify()
 
-        # print("SeaShell_Build: n {} nvert {} face {} select {}".format(n,nvert,face.index,face.select))
-        for i in range(n):
-            sc *= scl
-            rt += rot
+        skipped = 0
+        tail = []
+        start = nvert
+        for chunk in chunks:
+            sweep, count = seashell_core.ValidFaces(seashell_core.ChunkSweep(chunk, nvert, start, len(tail)))
+            skipped += count
 
             '''
-                Make new vertices on the current slice.
+                Make new vertices of the slices. The face vertices and
+                the last ring made are the first ring of the chunk.
             '''
-            for sco in verts:
-                x, y, z = TransPoint(self.axis, rt, sc, cen, sco)
-                newID = bm.verts.new((x, y, z))
-                back_p.append(newID)
-
-            for k in range(nvert):
-                '''
-                    Make new quadrangles around the current slice.
-                '''
-                l = (k + 1) % nvert
-                v1 = front_p[l]
-                v2 = front_p[k]
-                v3 = back_p[k]
-                v4 = back_p[l]
-
-                try:
-                    quad = bm.faces.new([v1, v2, v3, v4])
-                    quads.append(quad)
-                except ValueError:
-                    print("A face with these vertices already exists.")
-        
-            front_p = back_p[:]
-            back_p = []
+            new = [bm.verts.new(co) for co in sweep.positions.tolist()]
+            points = front_p + tail + new
+
+            for indices, uvs in seashell_core.SweepFaces(sweep):
+                for q, corners in enumerate(indices.tolist()):
+                    '''
+                        Make new polygons around the slices.
+                    '''
+                    polygon = bm.faces.new([points[c] for c in corners])
+
+                    '''
+                        Make UVs to the polygons when UV option is enabled.
+                    '''
+                    if self.uvs:
+                        for loop, uv in zip(polygon.loops, uvs[q].tolist()):
+                            loop[uv_layer].uv = uv
+
+            start += len(new)
+            tail = (tail + new)[-nvert:]
+        return skipped
+
+    def SeaShell_BuildBulk(self, bm, faces, settings, sweeps=None):
+        rings = [list(face.verts) for face in faces]
+        profiles = [[v.co[:] for v in ring] for ring in rings]
+        if sweeps is None:
+            sweeps = seashell_core.BuildSweeps([(profile, settings) for profile in profiles])
+        valid = [seashell_core.ValidFaces(sweep) for sweep in sweeps]
 
         '''
-            Make UVs to the quadrangles when UV option is enabled.
+            Make a temporary mesh holding all sweeps with the copies of
+            the face vertices as the first rings, and import it at once.
         '''
-        if self.uvs:
-            bm.verts.ensure_lookup_table()
-            bm.faces.ensure_lookup_table()
-            uv_layer = bm.loops.layers.uv.verify()
-            iterator = iter(quads)
-            for i in range(n):
-                for k in range(nvert):
-                    quad = next(iterator)
-                    for iv, loop in enumerate(quad.loops):
-                        match iv:
-                            case 0:
-                                u = (1.0 - i / n) * usiz
-                                v = 1.0 - k / nvert * self.vwrp
-                                loop[uv_layer].uv = (u, v)
-                            case 1:
-                                u = (1.0 - i / n) * usiz
-                                v = 1.0 - (k + 1) / nvert * self.vwrp
-                                loop[uv_layer].uv = (u, v)
-                            case 3:
-                                u = (1.0 - (i + 1) / n) * usiz
-                                v = 1.0 - k / nvert * self.vwrp
-                                loop[uv_layer].uv = (u, v)
-                            case 2:
-                                u = (1.0 - (i + 1) / n) * usiz
-                                v = 1.0 - (k + 1) / nvert * self.vwrp
-                                loop[uv_layer].uv = (u, v)
-        
+        mesh = self.SeaShell_Mesh("SeaShell", seashell_core.JoinSweeps(profiles, [sweep for sweep, count in valid]))
+        skipped = sum(count for sweep, count in valid)
+        if mesh is None:
+            return skipped
 
+        base = len(bm.verts)
+        bm.from_mesh(mesh)
+        bpy.data.meshes.remove(mesh)
+
+        '''
+            Weld the copies of the face vertices to the faces.
+        '''
+        bm.verts.ensure_lookup_table()
+        targetmap = {}
+        for ring, sweep in zip(rings, sweeps):
+            for k, v in enumerate(ring):
+                targetmap[bm.verts[base + k]] = v
+            base += len(ring) + len(sweep.positions)
+        bmesh.ops.weld_verts(bm, targetmap=targetmap)
+        return skipped
+
+    '''
+        Make a new mesh of the joined sweeps, or return None when they
+        have no polygons.
+    '''
+    def SeaShell_Mesh(self, name, joined):
+        faces = seashell_core.SweepFaces(joined)
+        loops = numpy.concatenate([indices.ravel() for indices, uvs in faces])
+        sizes = numpy.concatenate([numpy.full(len(indices), indices.shape[1]) for indices, uvs in faces])
+        if len(sizes) == 0:
+            return None
+
+        mesh = bpy.data.meshes.new(name)
+        mesh.vertices.add(len(joined.positions))
+        mesh.vertices.foreach_set("co", joined.positions.ravel().astype('f'))
+        mesh.loops.add(len(loops))
+        mesh.loops.foreach_set("vertex_index", loops.astype('i'))
+        mesh.polygons.add(len(sizes))
+        mesh.polygons.foreach_set("loop_start", (numpy.cumsum(sizes) - sizes).astype('i'))
+        if bpy.app.version < (4, 0, 0):
+            mesh.polygons.foreach_set("loop_total", sizes.astype('i'))
+        mesh.update(calc_edges=True)
+        if self.uvs:
+            uv_layer = mesh.uv_layers.new(name=self.uv_map_name)
+            uvs = numpy.concatenate([uvs.reshape(-1, 2) for indices, uvs in faces])
+            uv_layer.data.foreach_set("uv", uvs.ravel().astype('f'))
+        return mesh
+
+    '''
+        Make the levels of detail after the first as new objects. They
+        are parented to the edited object to share its transform, and
+        with caps the profile is their start cap.
+    '''
+    def SeaShell_WriteLODs(self, context, lods):
+        obj = context.object
+        for level, results in enumerate(list(zip(*lods))[1:], 1):
+            sweeps = [sweep for profile, sweep in results]
+            if self.cap != 'none':
+                sweeps = [sweep._replace(polygons=seashell_core.ProfileCap(len(profile), self.uvs) + sweep.polygons)
+                          for profile, sweep in results]
+            joined = seashell_core.JoinSweeps([profile for profile, sweep in results], sweeps)
+            mesh = self.SeaShell_Mesh("{}_LOD{}".format(obj.name, level), joined)
+            if mesh is None:
+                continue
+            lod = bpy.data.objects.new(mesh.name, mesh)
+            lod.parent = obj
+            context.collection.objects.link(lod)
 
     def execute(self, context):
         mesh = context.object.data
@@ -202,39 +323,71 @@ class MESH_OT_SeaShell(bpy.types.Operator):
         '''
             Operate all faces if nothing is selected. Otherwise, operate selected faces.
         '''
+        settings = self.SeaShell_Settings()
         if len(selected) == 0:
-            for face in bm.faces[:]:
-                self.SeaShell_Build(bm, face)
+            faces = bm.faces[:]
         else:
-            for face in selected[:]:
-                self.SeaShell_Build(bm, face)
+            faces = selected[:]
+
+        '''
+            Validate the profiles up front and skip the degenerate ones.
+        '''
+        problems = seashell_core.Problems()
+        valid = []
+        profiles = []
+        for face in faces:
+            profile = [v.co[:] for v in face.verts]
+            check = seashell_core.CheckProfile(profile, settings)
+            problems += check
+            if not check.degenerate:
+                valid.append(face)
+                profiles.append(profile)
+        faces = valid
+
+        '''
+            Check the predicted size of the sweeps against the budget
+            before anything is made. The clamped sides are the same for
+            all faces.
+        '''
+        budget = seashell_core.Budget(self.budget, self.budget_policy)
+        try:
+            clamped, cost, message = seashell_core.ApplyBudget([(profile, settings) for profile in profiles], budget)
+        except seashell_core.BudgetExceeded as error:
+            self.report({'ERROR'}, "SeaShell: {}".format(error))
+            return {'CANCELLED'}
+        if message:
+            self.report({'WARNING'}, "SeaShell: " + message)
+        if clamped:
+            settings = clamped[0]
+
+        '''
+            With levels of detail, all levels are derived from one sweep
+            and the full level is built into the edited mesh.
+        '''
+        chain = seashell_core.LOD_CHAIN[:self.lods]
+        lods = []
+        sweeps = None
+        if len(chain) > 1:
+            lods = seashell_core.BuildLODSweeps([(profile, settings) for profile in profiles], chain)
+            sweeps = [result[0][1] for result in lods]
+
+        if self.bulk:
+            skipped = self.SeaShell_BuildBulk(bm, faces, settings, sweeps)
+        else:
+            skipped = 0
+            for i, face in enumerate(faces):
+                skipped += self.SeaShell_Build(bm, face, settings, sweeps[i] if sweeps else None)
+        problems += seashell_core.Problems(skipped=skipped)
 
         bm.normal_update()
         bmesh.update_edit_mesh(mesh)
 
-        return {'FINISHED'}
+        if lods:
+            self.SeaShell_WriteLODs(context, lods)
 
-'''
-    Point translation function.
-'''  
-def TransPoint(axis, rot, scal, cen, sco):
-    if axis == 'X':
-        x = (sco[0] - cen) * scal + cen
-        y = (sco[0] * scal * math.cos(rot) - sco[2] * scal * math.sin(rot))
-        z = sco[1] * scal * math.sin(rot) + sco[2] * scal * math.cos(rot)
-        return x, y, z
-    elif axis == 'Y':
-        x = sco[0] * scal * math.cos(rot) - sco[2] * scal * math.sin(rot)
-        y = (sco[1] - cen) * scal + cen
-        z = (sco[0] * scal * math.sin(rot) + sco[2] * scal * math.cos(rot))
-        return x, y, z
-    elif axis == 'Z':
-        x = (sco[0] * scal * math.cos(rot) - sco[1] * scal * math.sin(rot))
-        y = sco[0] * scal * math.sin(rot) + sco[1] * scal * math.cos(rot)
-        z = (sco[2] - cen) * scal + cen
-        return x, y, z
-    else:
-        return sco[0], sco[1], sco[2]
+        if any(problems):
+            self.report({'WARNING'}, "SeaShell: " + problems.Format())
+        return {'FINISHED'}
 
 def menu_func(self, context):
     self.layout.operator(MESH_OT_SeaShell.bl_idname, icon='PLUGIN')
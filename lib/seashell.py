@@ -0,0 +1,339 @@
+#python
+
+import lx
+import numpy
+from array import array
+from concurrent.futures import ThreadPoolExecutor, wait
+from lxifc import UIValueHints, Visitor
+
+import seashell_core
+import seashell_telemetry
+from seashell_core import Settings
+
+'''
+    Store all profile polygons. The positions and the point IDs of the
+    profiles are packed into flat typed arrays, and offsets holds the
+    start of every face in them.
+'''
+class PolygonVisitor (Visitor):
+    def __init__ (self, polygon, vertex, map):
+        self.polygon = polygon
+        self.vertex = vertex;
+        self.map = map
+        self.faces = []
+        self.coords = array('d')
+        self.front_p = array('q')
+        self.offsets = array('q')
+        self.points = lx.object.storage('p', 4)
+        self.uv = lx.object.storage()
+        self.uv.setType('f')
+        self.uv.setSize(2)
+    
+    def vis_Evaluate(self):
+        nvert = self.polygon.VertexCount()
+        self.offsets.append(len(self.front_p))
+        for i in range(nvert):
+            pointID = self.polygon.VertexByIndex(i)
+            self.vertex.Select(pointID)
+            self.front_p.append(pointID)
+            self.coords.extend(self.vertex.Pos())
+        
+        type = self.polygon.Type()
+        self.faces.append((nvert, type, self.polygon.ID()))
+
+    '''
+        Positions of all profile vertices as an (n, 3) array sharing the
+        memory of coords.
+    '''
+    def Positions(self):
+        return numpy.frombuffer(self.coords, dtype=numpy.float64).reshape(-1, 3)
+
+'''
+    Popup of the cap styles for the cap attribute of the servers.
+'''
+class CapHints (UIValueHints):
+    def __init__ (self):
+        self.names = ('None', 'N-gon', 'Fan', 'Point')
+
+    def uiv_Flags (self):
+        return lx.symbol.fVALHINT_POPUPS
+
+    def uiv_PopCount (self):
+        return len(seashell_core.CAP_STYLES)
+
+    def uiv_PopUserName (self, index):
+        return self.names[index]
+
+    def uiv_PopInternalName (self, index):
+        return seashell_core.CAP_STYLES[index]
+
+'''
+    Seconds between the updates of a Monitor while it waits for the
+    background computation.
+'''
+MONITOR_INTERVAL = 0.1
+
+'''
+    Progress monitor of a build in the Modo UI. Run computes the sweeps
+    in a background thread and keeps the monitor updated meanwhile, and
+    the writes count their points with Step. When the user aborts, the
+    progress is cancelled, so the computation stops between slices and
+    the next step raises seashell_core.Cancelled.
+'''
+class Monitor(object):
+    def __init__(self, title):
+        self.title = title
+        self.progress = seashell_core.Progress()
+        self.dialog = lx.service.Dialog()
+        self.monitor = None
+
+    def Start(self, total):
+        self.monitor = lx.object.Monitor(self.dialog.MonitorAllocate(self.title))
+        self.monitor.Initialize(max(1, total))
+
+    def Update(self):
+        try:
+            self.monitor.Increment(self.progress.Take())
+        except RuntimeError:
+            '''
+                Increment fails with LXe_ABORT when the user aborts.
+            '''
+            self.progress.Cancel()
+
+    def Step(self, count):
+        self.progress.Step(count)
+        self.Update()
+
+    def Run(self, compute):
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='seashell-build') as worker:
+            future = worker.submit(compute, self.progress)
+            try:
+                while not future.done():
+                    wait([future], timeout=MONITOR_INTERVAL)
+                    self.Update()
+            except BaseException:
+                self.progress.Cancel()
+                raise
+        return future.result()
+
+    def Release(self):
+        if self.monitor is not None:
+            self.monitor = None
+            self.dialog.MonitorRelease()
+
+'''
+    Build seashell shape using given attributes. The sweeps are taken
+    from the cache when it is given. With a vertex budget, a coarse
+    preview making at most about budget new vertices is built instead.
+'''
+def Build(vis, settings, cache=None, budget=None):
+    BuildAll([vis], settings, cache, budget)
+
+'''
+    Build seashell shapes of several mesh layers. The sweeps of all
+    profiles in all layers are computed concurrently and only writing
+    them into the meshes is done one by one. Very large sweeps are not
+    built whole but streamed into the mesh chunk by chunk.
+
+    With a Monitor, the sweeps are computed in its background thread and
+    the writes are counted in it. The streamed sweeps are computed while
+    they are written. seashell_core.Cancelled is raised when the user
+    aborts, and the edits made so far must not be applied.
+'''
+def BuildAll(visitors, settings, cache=None, budget=None, monitor=None):
+    layers = Budgeted([Profiles(vis, settings, budget) for vis in visitors])
+    jobs = [(profile, job) for profiles in layers for profile, ids, type, job in profiles]
+    built = [job for job in jobs if not seashell_core.Streamed(*job)]
+    progress = None
+    with seashell_telemetry.Stage('compute'):
+        if monitor is None:
+            sweeps = iter(seashell_core.BuildSweeps(built, cache))
+        else:
+            monitor.Start(2 * sum(seashell_core.SweepSize(*job) for job in jobs))
+            sweeps = iter(monitor.Run(lambda progress: seashell_core.BuildSweeps(built, cache, progress)))
+            progress = monitor.progress
+
+    for vis, profiles in zip(visitors, layers):
+        for profile, ids, type, job in profiles:
+            if seashell_core.Streamed(profile, job):
+                WriteStream(vis, ids, type, job, seashell_core.IterSweep(profile, job, progress=progress), monitor)
+            else:
+                sweep = next(sweeps)
+                Write(vis, ids, type, job, sweep)
+                if monitor is not None:
+                    monitor.Step(seashell_core.SweepSize(profile, job))
+
+'''
+    Build the levels of detail of the seashell shapes of several layers.
+    The levels of a profile are all derived from one sweep. The first
+    level is written into the layers like BuildAll, and the others are
+    returned per layer as a list of levels, each a list of (profile,
+    type, sweep) to be written into a new mesh by WriteLOD. With caps,
+    these also get the profile as their start cap, which the layers
+    have as the profile polygon. A Monitor is used like in BuildAll.
+'''
+def BuildLODs(visitors, settings, chain=seashell_core.LOD_CHAIN, monitor=None):
+    layers = Budgeted([Profiles(vis, settings) for vis in visitors])
+    jobs = [(profile, job) for profiles in layers for profile, ids, type, job in profiles]
+    with seashell_telemetry.Stage('compute'):
+        if monitor is None:
+            results = iter(seashell_core.BuildLODSweeps(jobs, chain))
+        else:
+            monitor.Start(2 * sum(seashell_core.SweepSize(*job) for job in jobs))
+            results = iter(monitor.Run(lambda progress: seashell_core.BuildLODSweeps(jobs, chain, progress)))
+
+    lods = []
+    for vis, profiles in zip(visitors, layers):
+        levels = [[] for lod in chain[1:]]
+        for profile, ids, type, job in profiles:
+            result = next(results)
+            Write(vis, ids, type, job, result[0][1])
+            if monitor is not None:
+                monitor.Step(seashell_core.SweepSize(profile, job))
+            for level, (lod_profile, sweep) in zip(levels, result[1:]):
+                if job.cap != 'none':
+                    sweep = sweep._replace(polygons=seashell_core.ProfileCap(len(lod_profile), job.uvs) + sweep.polygons)
+                level.append((lod_profile, type, sweep))
+        lods.append(levels)
+    return lods
+
+'''
+    Check the profiles of all layers against the budget set by the
+    environment before anything is built. Raises
+    seashell_core.BudgetExceeded when the build is refused, and returns
+    the layers with the settings clamped to the budget otherwise. What
+    was done is written to the event log.
+'''
+def Budgeted(layers):
+    jobs = [(profile, job) for profiles in layers for profile, ids, type, job in profiles]
+    clamped, cost, message = seashell_core.ApplyBudget(jobs, seashell_core.EnvironmentBudget())
+    if message:
+        lx.out("seashell: " + message)
+    clamped = iter(clamped)
+    return [[(profile, ids, type, next(clamped)) for profile, ids, type, job in profiles] for profiles in layers]
+
+'''
+    Write a level of detail into an empty mesh. The points of the
+    profiles are made first as the first rings of the sweeps.
+'''
+def WriteLOD(vis, level, settings):
+    for profile, type, sweep in level:
+        with seashell_telemetry.Stage('points'):
+            ids = list(map(vis.vertex.New, profile.tolist()))
+        Write(vis, ids, type, settings, sweep)
+
+'''
+    Split the stored polygons into profiles. Each profile is a tuple of
+    the positions, the point IDs, the polygon type and the settings used
+    to sweep it.
+'''
+def Profiles(vis, settings, budget=None):
+    profiles = []
+    positions = vis.Positions()
+
+    for start, (nvert, type, id) in zip(vis.offsets, vis.faces):
+        job = settings
+        stride = 1
+        if budget:
+            nsid, stride = seashell_core.PreviewResolution(nvert, settings, budget // len(vis.faces))
+            job = settings._replace(nsid=nsid)
+
+        end = start + nvert
+        profiles.append((positions[start:end:stride], vis.front_p[start:end:stride], type, job))
+    return profiles
+
+'''
+    Number of polygons whose point IDs are looked up at a time by Write.
+'''
+WRITE_BATCH = 4096
+
+'''
+    Write a sweep into the mesh. Returns the IDs of the points of the
+    sweep, the profile points first, and the texture coordinates written
+    to the new points, or None without UVs. known is passed to WriteUVs.
+
+    Every point and polygon takes one SDK call, so everything else is
+    done ahead in NumPy: the point IDs of the polygon corners are looked
+    up for a batch of polygons at once, and the storage of each polygon
+    size is filled with a single call per polygon.
+'''
+def Write(vis, ids, type, settings, sweep, known=None):
+    '''
+        Make new vertices of all slices. The profile points are the
+        first ring of the sweep.
+    '''
+    with seashell_telemetry.Stage('points'):
+        points = list(ids)
+        points.extend(map(vis.vertex.New, sweep.positions.tolist()))
+    seashell_telemetry.Count('points', len(sweep.positions))
+
+    '''
+        Make new polygons around the slices.
+    '''
+    with seashell_telemetry.Stage('polygons'):
+        table = numpy.array(points, dtype=numpy.int64)
+        polygons = []
+        for indices, uvs in seashell_core.SweepFaces(sweep):
+            size = indices.shape[1]
+            storage = vis.points if size == 4 else lx.object.storage('p', size)
+            for start in range(0, len(indices), WRITE_BATCH):
+                for corners in table[indices[start:start + WRITE_BATCH]].tolist():
+                    storage.set(corners)
+                    polygons.append(vis.polygon.NewProto(type, storage, size, 0))
+    seashell_telemetry.Count('polygons', len(polygons))
+
+    '''
+        Make UVs to the polygons when UV option is enabled.
+    '''
+    values = None
+    if settings.uvs:
+        with seashell_telemetry.Stage('uvs'):
+            values = WriteUVs(vis, points, polygons, sweep, known)
+    return points, values
+
+'''
+    Write the chunks of a sweep from IterSweep one after another. Only
+    the IDs of the profile points and of the last ring written, and the
+    texture coordinates of that ring, are kept to join the next chunk to.
+    The points of every chunk are counted in the monitor when it is given.
+'''
+def WriteStream(vis, ids, type, settings, chunks, monitor=None):
+    ids = list(ids)
+    nvert = len(ids)
+    tail = []
+    known = numpy.empty((0, 2))
+    start = nvert
+    for chunk in chunks:
+        sweep = seashell_core.ChunkSweep(chunk, nvert, start, len(tail))
+        points, values = Write(vis, ids + tail, type, settings, sweep, known)
+        start += len(sweep.positions)
+        tail = points[nvert:][-nvert:]
+        if values is not None:
+            known = numpy.concatenate((known, values))[-nvert:]
+        if monitor is not None:
+            monitor.Step(len(sweep.positions))
+
+'''
+    Write the texture coordinates of a sweep. Most corners share the
+    coordinates of their point, so they are written once per new point,
+    and only the corners on the profile and the corners with their own
+    coordinates, such as on the seam, are written to the polygons.
+    known holds the coordinates already on the last points before the
+    new ones. Returns the coordinates written to the new points.
+'''
+def WriteUVs(vis, points, polygons, sweep, known=None):
+    nprofile = len(points) - len(sweep.positions)
+    values, corners = seashell_core.SharedUVs(nprofile, sweep, known)
+    seashell_telemetry.Count('uvs', len(values) + sum(len(split) for q, split in corners))
+
+    for pointID, uv in zip(points[nprofile:], values.tolist()):
+        vis.uv.set(uv)
+        vis.vertex.Select(pointID)
+        vis.vertex.SetMapValue(vis.map, vis.uv)
+
+    for q, split in corners:
+        vis.polygon.Select(polygons[q])
+        for index, uv in split:
+            vis.uv.set(uv)
+            vis.polygon.SetMapValue(points[index], vis.map, vis.uv)
+    return values
@@ -0,0 +1,186 @@
+#python
+
+'''
+
+    On-disk cache of the seashell sweeps shared across sessions. It is
+    enabled by setting the environment variable SEASHELL_CACHE_DIR to a
+    directory, and SEASHELL_CACHE_SIZE sets its size cap in megabytes
+    (1024 by default).
+
+    Every sweep is stored in a directory named by the hash of the profile
+    coordinates and the digest of the settings, holding the positions,
+    the quad indices, the UVs and the other polygons as .npy files. They
+    are memory-mapped when they are read back, so a hit only maps the
+    files and the pages are read while the sweep is written to the mesh.
+    The least recently used sweeps are removed when the cache is over
+    its size.
+
+    The last sweeps used are also kept in memory and are looked up before
+    the disk, so evaluating the same settings again does not touch the
+    cache directory.
+
+'''
+
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
+
+import seashell_core
+
+'''
+    Open the cache set by the environment in front of the given cache,
+    such as a SweepCache, or return that cache when no directory is set.
+'''
+def Open(cache=None):
+    directory = os.environ.get('SEASHELL_CACHE_DIR')
+    if not directory:
+        return cache
+    maxbytes = int(float(os.environ.get('SEASHELL_CACHE_SIZE', '1024')) * 1024 * 1024)
+    return DiskCache(directory, maxbytes, cache)
+
+
+class DiskCache(object):
+    def __init__(self, directory, maxbytes=1 << 30, cache=None, maxsize=16):
+        self.directory = directory
+        self.maxbytes = maxbytes
+        self.cache = cache
+        self.maxsize = maxsize
+        self.sweeps = OrderedDict()
+        self.total = None
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def Key(self, profile, settings):
+        digest = hashlib.sha1(profile.tobytes())
+        digest.update(settings.Digest().encode('ascii'))
+        return digest.hexdigest()
+
+    def BuildSweep(self, profile, settings, progress=None):
+        profile = np.ascontiguousarray(profile, dtype=np.float64).reshape(-1, 3)
+        key = self.Key(profile, settings)
+        with self.lock:
+            sweep = self.sweeps.get(key)
+            if sweep is not None:
+                self.sweeps.move_to_end(key)
+
+        if sweep is None:
+            path = os.path.join(self.directory, key)
+            sweep = self.Load(path)
+            built = sweep is None
+            if built:
+                build = self.cache.BuildSweep if self.cache is not None else seashell_core.BuildSweep
+                sweep = build(profile, settings, progress)
+                for indices, uvs in seashell_core.SweepFaces(sweep):
+                    for array in (indices, uvs):
+                        if array is not None:
+                            array.setflags(write=False)
+                sweep.positions.setflags(write=False)
+            with self.lock:
+                self.sweeps[key] = sweep
+                while len(self.sweeps) > self.maxsize:
+                    self.sweeps.popitem(last=False)
+            if built:
+                self.Save(path, sweep)
+                progress = None
+
+        if progress is not None:
+            progress.Step(seashell_core.SweepSize(profile, settings))
+        return sweep
+
+    '''
+        Map the sweep stored in path, or return None when it is not
+        stored. A broken entry is removed.
+    '''
+    def Load(self, path):
+        if not os.path.isdir(path):
+            return None
+        try:
+            load = lambda name: np.load(os.path.join(path, name + '.npy'), mmap_mode='r')
+            exists = lambda name: os.path.exists(os.path.join(path, name + '.npy'))
+
+            polygons = []
+            while exists('polygon{}'.format(len(polygons))):
+                name = 'polygon{}'.format(len(polygons))
+                polygons.append((load(name), load(name + '_uvs') if exists(name + '_uvs') else None))
+            sweep = seashell_core.Sweep(load('positions'), load('quads'),
+                                        load('uvs') if exists('uvs') else None, tuple(polygons))
+            os.utime(path)
+        except (OSError, ValueError):
+            shutil.rmtree(path, ignore_errors=True)
+            return None
+        return sweep
+
+    '''
+        Store the sweep into path. The files are written into a temporary
+        directory which is renamed at the end, so other sessions never
+        see a partial entry.
+    '''
+    def Save(self, path, sweep):
+        temp = None
+        try:
+            temp = tempfile.mkdtemp(prefix='.', dir=self.directory)
+            save = lambda name, array: np.save(os.path.join(temp, name + '.npy'), np.ascontiguousarray(array))
+
+            save('positions', sweep.positions)
+            save('quads', sweep.quads)
+            if sweep.uvs is not None:
+                save('uvs', sweep.uvs)
+            for i, (indices, uvs) in enumerate(sweep.polygons):
+                save('polygon{}'.format(i), indices)
+                if uvs is not None:
+                    save('polygon{}_uvs'.format(i), uvs)
+            size = sum(f.stat().st_size for f in os.scandir(temp))
+            os.rename(temp, path)
+        except OSError:
+            if temp is not None:
+                shutil.rmtree(temp, ignore_errors=True)
+            return
+        with self.lock:
+            if self.total is not None:
+                self.total += size
+        self.Evict()
+
+    '''
+        Remove the least recently used entries until the cache is within
+        its size. The directory is only scanned on the first call and when
+        the entries saved since then may have filled the cache. The entries
+        of the sweeps kept in memory are mapped and are not removed, and
+        an entry which cannot be removed, such as a mapped one on Windows,
+        still counts in the size.
+    '''
+    def Evict(self):
+        with self.lock:
+            if self.total is not None and self.total <= self.maxbytes:
+                return
+            held = set(self.sweeps)
+            entries = []
+            total = 0
+            for entry in os.scandir(self.directory):
+                if entry.name.startswith('.') or not entry.is_dir():
+                    continue
+                size = sum(f.stat().st_size for f in os.scandir(entry.path))
+                entries.append((entry.stat().st_mtime, size, entry.path))
+                total += size
+
+            entries.sort()
+            for mtime, size, path in entries:
+                if total <= self.maxbytes:
+                    break
+                if os.path.basename(path) in held:
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+                if not os.path.exists(path):
+                    total -= size
+            self.total = total
+
+    def Clear(self):
+        with self.lock:
+            self.sweeps.clear()
+            self.total = None
+            for entry in os.scandir(self.directory):
+                if entry.is_dir():
+                    shutil.rmtree(entry.path, ignore_errors=True)
@@ -0,0 +1,991 @@
+#python
+
+'''
+
+    Host independent seashell geometry kernel. The whole sweep of a
+    profile polygon is computed at once with NumPy, and the Modo servers
+    and the Blender operator only copy the result into their own mesh.
+
+'''
+
+import functools
+import hashlib
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from collections import namedtuple, OrderedDict
+
+'''
+    seashell parameters. The record is immutable and hashable, so it is
+    passed to every build explicitly and can be used as a cache key.
+'''
+class Settings(namedtuple('Settings', ['axis', 'nrep', 'nsid', 'off', 'uvs', 'uwrp', 'vwrp', 'scl', 'vrot', 'name', 'weld', 'adapt', 'cap'],
+                          defaults=[1, 4, 20, 1.0, True, 0.2, 1.0, 0.6, False, 'Texture', 0.0, 0.0, 'none'])):
+    __slots__ = ()
+
+    '''
+        Digest of the parameters which stays the same across sessions,
+        unlike hash() of strings.
+    '''
+    def Digest(self):
+        return hashlib.sha1(repr(tuple(self)).encode('utf-8')).hexdigest()
+
+
+'''
+    Result of a sweep. The vertices of the profile itself are ring 0 and
+    the rows of positions are rings 1 to n, so the quad indices refer to
+    the profile for values below nvert and to positions[index - nvert]
+    otherwise. Each quad is ordered as front[l], front[k], back[k],
+    back[l] and uvs holds the texture coordinates of these four corners.
+    Polygons which are not quads are stored in polygons as groups of
+    (indices, uvs) arrays shaped (m, k) and (m, k, 2) for k sided ones.
+'''
+Sweep = namedtuple('Sweep', ['positions', 'quads', 'uvs', 'polygons'], defaults=[()])
+
+
+'''
+    Styles of the cap closing the last ring: none, a single polygon, a
+    fan of triangles around the center, or the ring collapsed into its
+    center.
+'''
+CAP_STYLES = ('none', 'ngon', 'fan', 'point')
+
+'''
+    Sweep the profile, an (nvert, 3) array of positions, around the axis
+    with the given settings. The points made are counted by progress
+    when it is given.
+'''
+def BuildSweep(profile, settings, progress=None):
+    profile = np.asarray(profile, dtype=np.float64).reshape(-1, 3)
+    nvert = len(profile)
+    n = settings.nsid * settings.nrep
+    steps = SliceSteps(profile, settings)
+
+    positions = TransformProfile(profile, settings, steps, progress)
+    quads = QuadIndices(n if steps is None else len(steps), nvert)
+    uvs = None
+    if settings.uvs:
+        uvs = CornerUVs(n, nvert, settings, steps)
+    sweep = Sweep(positions, quads, uvs)
+    return CloseSweep(profile, sweep, settings)
+
+'''
+    Weld the apex of a whole sweep and cap its last ring as set by the
+    settings. A sweep ending in a welded apex is closed already and gets
+    no cap.
+'''
+def CloseSweep(profile, sweep, settings):
+    welder = None
+    if settings.weld > 0.0:
+        welder = Welder(profile, settings.weld)
+        sweep = welder.Weld(sweep, 0)
+    if welder is None or welder.apex is None:
+        sweep = CapSweep(sweep, len(profile), settings.cap, len(profile))
+    return sweep
+
+'''
+    Sweep the profile chunk by chunk. Every chunk is a Sweep of the next
+    chunk slices, whose positions are the points it adds and whose
+    polygons refer to the points with the same indices as the whole
+    sweep, so joining the chunks in order gives the result of BuildSweep.
+    Only the transforms of one chunk are held at a time, and the welding
+    state is carried from chunk to chunk.
+'''
+def IterSweep(profile, settings, chunk=1, progress=None):
+    profile = np.asarray(profile, dtype=np.float64).reshape(-1, 3)
+    nvert = len(profile)
+    n = settings.nsid * settings.nrep
+    steps = SliceSteps(profile, settings)
+    if steps is None:
+        steps = np.arange(1, n + 1)
+
+    scl = max(settings.scl, 1.0e-6)
+    cen = settings.off / scl
+    table = SliceTable(settings.nsid, settings.nrep, scl)[steps - 1]
+    if settings.uvs:
+        u, v = UVTables(n, nvert, settings, steps)
+    welder = Welder(profile, settings.weld) if settings.weld > 0.0 else None
+
+    count = nvert
+    for start in range(0, len(steps), chunk):
+        stop = min(start + chunk, len(steps))
+        positions = TransformSlices(profile, settings.axis, table[start:stop], cen).reshape(-1, 3)
+        if progress is not None:
+            progress.Step(len(positions))
+        quads = QuadIndices(stop - start, nvert) + start * nvert
+        uvs = QuadUVs(u[start:stop + 1], v) if settings.uvs else None
+        sweep = Sweep(positions, quads, uvs)
+        if welder is not None:
+            sweep = welder.Weld(sweep, start)
+        if stop == len(steps) and (welder is None or welder.apex is None):
+            sweep = CapSweep(sweep, nvert, settings.cap, count)
+        count += len(sweep.positions)
+        yield sweep
+
+'''
+    Number of new vertices from which a sweep is written chunk by chunk
+    from IterSweep instead of being built whole.
+'''
+STREAM_MIN_SIZE = 1000000
+
+def Streamed(profile, settings):
+    return len(profile) * settings.nsid * settings.nrep >= STREAM_MIN_SIZE
+
+'''
+    Re-index a chunk of IterSweep so that it is written like a whole
+    sweep. The points before the chunk which it may refer to are the
+    profile and the last points of the previous chunks, at most one
+    ring. With start, the index of the first point of the chunk, and
+    tail, the number of these last points, the profile and the tail are
+    ring 0 of the result and the points of the chunk follow them.
+'''
+def ChunkSweep(chunk, nvert, start, tail):
+    offset = start - tail - nvert
+    def Local(indices):
+        return np.where(indices < nvert, indices, indices - offset)
+    return Sweep(chunk.positions, Local(chunk.quads), chunk.uvs,
+                 tuple((Local(indices), uvs) for indices, uvs in chunk.polygons))
+
+'''
+    Number of new vertices below which BuildSweeps works in the calling
+    thread, because handing small jobs to the pool costs more than it saves.
+'''
+PARALLEL_MIN_SIZE = 50000
+
+_executor = None
+_executor_lock = threading.Lock()
+
+'''
+    Sweep several profiles concurrently. Each job is a pair of the
+    profile and the settings. NumPy releases the GIL while it works on
+    the arrays, so the sweeps run on all cores in a thread pool.
+
+    Profiles which are copies of one another are swept only once. The
+    slices only rotate about the axis and scale, so a profile rotated
+    about the axis gives the same sweep rotated alike, and it takes the
+    positions of the first copy rotated, sharing its polygons and UVs.
+    With progress, the copies count the points of the first one.
+'''
+def BuildSweeps(jobs, cache=None, progress=None):
+    build = cache.BuildSweep if cache is not None else BuildSweep
+    if progress is not None:
+        build = functools.partial(build, progress=progress)
+    if len(jobs) < 2:
+        return MapJobs(build, jobs)
+
+    groups = OrderedDict()
+    members = []
+    for profile, settings in jobs:
+        profile = np.asarray(profile, dtype=np.float64).reshape(-1, 3)
+        key, rotation = ProfileKey(profile, settings)
+        group = groups.setdefault(key, (profile, settings, rotation))
+        members.append((key, profile, rotation))
+
+    sweeps = dict(zip(groups, MapJobs(build, [(profile, settings) for profile, settings, rotation in groups.values()])))
+    results = []
+    for key, profile, rotation in members:
+        first, settings, first_rotation = groups[key]
+        sweep = sweeps[key]
+        if profile is not first:
+            if not np.array_equal(profile, first):
+                mat = np.matmul(rotation, first_rotation.T)
+                sweep = sweep._replace(positions=np.matmul(sweep.positions, mat.T))
+            if progress is not None:
+                progress.Step(SweepSize(profile, settings))
+        results.append(sweep)
+    return results
+
+'''
+    Number of decimals to which the profiles are compared by ProfileKey.
+'''
+PROFILE_DECIMALS = 9
+
+'''
+    Key of the profile and the settings that is the same for all copies
+    of the profile rotated about the axis, and the rotation taking the
+    copy with the key from its canonical orientation, where the first
+    vertex off the axis lies in the direction of the first plane axis.
+    With the X axis the slices are not plain rotations, so only equal
+    profiles have the same key there.
+'''
+def ProfileKey(profile, settings):
+    rotation = np.identity(3)
+    if settings.axis != 0 and len(profile):
+        i, j = [(1, 2), (0, 2), (0, 1)][min(settings.axis, 2)]
+        radius = np.hypot(profile[:, i], profile[:, j])
+        off = np.flatnonzero(radius > 10.0 ** -PROFILE_DECIMALS * max(radius.max(), 1.0))
+        if len(off):
+            k = off[0]
+            rotation = AxisRotation(i, j, math.atan2(profile[k, j], profile[k, i]))
+    canonical = np.matmul(profile, rotation).round(PROFILE_DECIMALS) + 0.0
+    return (settings, canonical.shape, canonical.tobytes()), rotation
+
+'''
+    Rotation matrix by angle in the plane of the coordinates i and j.
+'''
+def AxisRotation(i, j, angle):
+    rotation = np.identity(3)
+    rotation[i, i], rotation[i, j] = math.cos(angle), -math.sin(angle)
+    rotation[j, i], rotation[j, j] = math.sin(angle), math.cos(angle)
+    return rotation
+
+'''
+    Run build(profile, settings) of every job, in the thread pool when
+    the jobs are large enough to pay for it.
+'''
+def MapJobs(build, jobs):
+    size = sum(len(profile) * settings.nsid * settings.nrep for profile, settings in jobs)
+    if len(jobs) < 2 or size < PARALLEL_MIN_SIZE:
+        return [build(profile, settings) for profile, settings in jobs]
+    return list(Executor().map(lambda job: build(*job), jobs))
+
+'''
+    Thread pool shared by all builds.
+'''
+def Executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix='seashell')
+        return _executor
+
+'''
+    Raised by a build when its progress was cancelled.
+'''
+class Cancelled(Exception):
+    pass
+
+'''
+    Progress of builds running in other threads. The builds count the
+    points they make with Step, which raises Cancelled once Cancel was
+    called, so they stop between slices. Take returns the points counted
+    since the last call.
+'''
+class Progress(object):
+    def __init__(self):
+        self.count = 0
+        self.cancelled = False
+        self.lock = threading.Lock()
+
+    def Cancel(self):
+        self.cancelled = True
+
+    def Step(self, count):
+        if self.cancelled:
+            raise Cancelled()
+        with self.lock:
+            self.count += count
+
+    def Take(self):
+        with self.lock:
+            count, self.count = self.count, 0
+        return count
+
+'''
+    Number of points made by the slices of a sweep before welding and
+    capping, which is the work a build counts in its progress.
+'''
+def SweepSize(profile, settings):
+    profile = np.asarray(profile, dtype=np.float64).reshape(-1, 3)
+    steps = SliceSteps(profile, settings)
+    return len(profile) * (settings.nsid * settings.nrep if steps is None else len(steps))
+
+'''
+    Number of points transformed at a time when a build counts its
+    progress.
+'''
+PROGRESS_BLOCK = 65536
+
+'''
+    Make the vertex positions of all slices. Every slice is one affine
+    transform applied to the whole profile. Only the slices listed in
+    steps are made when it is given. With progress, the slices are made
+    block by block and counted after each block.
+'''
+def TransformProfile(profile, settings, steps=None, progress=None):
+    scl = max(settings.scl, 1.0e-6)
+    cen = settings.off / scl
+    table = SliceTable(settings.nsid, settings.nrep, scl)
+    if steps is not None:
+        table = table[steps - 1]
+    if progress is None:
+        return TransformSlices(profile, settings.axis, table, cen).reshape(-1, 3)
+
+    nvert = len(profile)
+    rings = np.empty((len(table), nvert, 3))
+    block = max(1, PROGRESS_BLOCK // max(nvert, 1))
+    for start in range(0, len(table), block):
+        stop = min(start + block, len(table))
+        rings[start:stop] = TransformSlices(profile, settings.axis, table[start:stop], cen)
+        progress.Step((stop - start) * nvert)
+    return rings.reshape(-1, 3)
+
+'''
+    Apply the transforms of the rows of the slice table to the profile.
+    Returns the rings as an (m, nvert, 3) array.
+'''
+def TransformSlices(profile, axis, table, cen):
+    mat, trans = SliceMatrices(axis, table, cen)
+    dco = np.matmul(profile, mat.transpose(0, 2, 1))
+    dco += trans[:, None, :]
+    return dco
+
+'''
+    Table of (cos, sin, scale) of every slice. The rotation angle and the
+    scale of slice i are rot * i and scl ** (i / nsid). The table only
+    depends on these three values, so it is shared by all builds.
+'''
+@functools.lru_cache(maxsize=32)
+def SliceTable(nsid, nrep, scl):
+    step = np.arange(1, nsid * nrep + 1, dtype=np.float64)
+    rot = step * (math.pi / nsid)
+    table = np.stack((np.cos(rot), np.sin(rot), np.power(scl, step / nsid)), axis=-1)
+    table.setflags(write=False)
+    return table
+
+'''
+    Choose the slices of an adaptive sweep when settings.adapt is set, or
+    return None to keep all of them. Starting from the profile, every
+    step skips as many slices as the chord of the widest point of the
+    ring stays within the tolerance of its arc. The rings shrink by the
+    scale along the spiral, so the inner whorls get longer steps and the
+    edges keep about the same length. A step never goes below one slice
+    nor over a quarter turn, and the last slice is always kept.
+'''
+def SliceSteps(profile, settings):
+    if settings.adapt <= 0.0:
+        return None
+    n = settings.nsid * settings.nrep
+    scl = max(settings.scl, 1.0e-6)
+    plane = [(1, 2), (0, 2), (0, 1)][min(settings.axis, 2)]
+    radius = np.linalg.norm(profile[:, plane], axis=1).max() if len(profile) else 0.0
+    rot = math.pi / settings.nsid
+    limit = max(1, settings.nsid // 2)
+
+    steps = []
+    t = 0
+    while t < n:
+        size = radius * scl ** (t / settings.nsid)
+        if size > settings.adapt:
+            angle = 2.0 * math.acos(1.0 - settings.adapt / size)
+            step = min(max(1, int(angle / rot)), limit)
+        else:
+            step = limit
+        t = min(t + step, n)
+        steps.append(t)
+    return np.array(steps, dtype=np.intp)
+
+'''
+    Make the 3x3 matrix and the translation of every slice from the slice
+    table. The rotation plane and the shift axis are chosen by axis.
+'''
+def SliceMatrices(axis, table, cen):
+    cs = table[:, 0] * table[:, 2]
+    sn = table[:, 1] * table[:, 2]
+    sc = table[:, 2]
+
+    mat = np.zeros((len(table), 3, 3))
+    trans = np.zeros((len(table), 3))
+    if axis == 0:
+        mat[:, 0, 0] = sc
+        mat[:, 1, 0], mat[:, 1, 2] = cs, -sn
+        mat[:, 2, 1], mat[:, 2, 2] = sn, cs
+    elif axis == 1:
+        mat[:, 0, 0], mat[:, 0, 2] = cs, -sn
+        mat[:, 1, 1] = sc
+        mat[:, 2, 0], mat[:, 2, 2] = sn, cs
+    else:
+        mat[:, 0, 0], mat[:, 0, 1] = cs, -sn
+        mat[:, 1, 0], mat[:, 1, 1] = sn, cs
+        mat[:, 2, 2] = sc
+    trans[:, min(axis, 2)] = cen * (1.0 - sc)
+    return mat, trans
+
+'''
+    Make the quadrangles between every pair of neighbouring rings.
+'''
+def QuadIndices(n, nvert):
+    k = np.arange(nvert)
+    l = (k + 1) % nvert
+    front = (np.arange(n) * nvert)[:, None]
+    back = front + nvert
+    quads = np.stack((front + l, front + k, back + k, back + l), axis=-1)
+    return quads.reshape(-1, 4)
+
+'''
+    Make the texture coordinates of the quad corners. U runs along the
+    sweep and V runs around the profile.
+'''
+def CornerUVs(n, nvert, settings, steps=None):
+    return QuadUVs(*UVTables(n, nvert, settings, steps))
+
+'''
+    Make the texture coordinates of the quad corners between the rings
+    of the U values u from the V values v of the profile.
+'''
+def QuadUVs(u, v):
+    nvert = len(v) - 1
+    uvs = np.empty((len(u) - 1, nvert, 4, 2))
+    uvs[:, :, 0, 0] = uvs[:, :, 1, 0] = u[:-1, None]
+    uvs[:, :, 2, 0] = uvs[:, :, 3, 0] = u[1:, None]
+    uvs[:, :, 1, 1] = uvs[:, :, 2, 1] = v[:-1]
+    uvs[:, :, 0, 1] = uvs[:, :, 3, 1] = v[1:]
+    return uvs.reshape(-1, 4, 2)
+
+'''
+    Texture coordinates shared by the rings. U of the ring i is u[i] and
+    V of the profile vertex k is v[k], and v[nvert] is V on the seam.
+    The rings of an adaptive sweep keep U of the slices they stand for.
+'''
+def UVTables(n, nvert, settings, steps=None):
+    usiz = n * settings.uwrp
+    t = np.arange(n + 1) if steps is None else np.concatenate(([0], steps))
+    u = (1.0 - t / n) * usiz
+    v = 1.0 - np.arange(nvert + 1) / nvert * settings.vwrp
+    return u, v
+
+'''
+    Weld the rings which have shrunk within the tolerance into a single
+    point, and merge the following points closer than the tolerance to
+    it, as it happens near the apex when the scale drives the rings to a
+    point. Quads with two corners on the same point become triangles and
+    the quads collapsing to a line or a point are removed. Quads on four
+    distinct points are always kept, however small, so the shell stays
+    closed.
+'''
+def WeldSweep(profile, sweep, tolerance):
+    return Welder(profile, tolerance).Weld(sweep, 0)
+
+'''
+    Welding state carried along the sweep, so that the chunks of
+    IterSweep can be welded one after another. It keeps the new index
+    and the welded position of every point of the last ring, the next
+    free index and the apex point being merged into.
+'''
+class Welder(object):
+    def __init__(self, profile, tolerance):
+        self.tolerance = tolerance
+        self.remap = np.arange(len(profile))
+        self.coords = profile
+        self.count = len(profile)
+        self.apex = None
+
+    '''
+        Weld the rings of a sweep or a chunk. first is the ring the
+        chunk starts after, so the quads of the chunk refer to the
+        points of the rings first to first + m.
+    '''
+    def Weld(self, sweep, first):
+        tolerance = self.tolerance
+        nvert = len(self.remap)
+        rings = sweep.positions.reshape(-1, nvert, 3)
+        n = len(rings)
+        centers = rings.mean(axis=1)
+        radius = np.linalg.norm(rings - centers[:, None, :], axis=2).max(axis=1)
+        collapsed = radius <= tolerance
+
+        '''
+            Until a ring collapses, every point keeps its own index, so
+            the quads have four distinct points and there is nothing to
+            remove. The same polygons are kept whether the sweep is welded
+            whole or chunk by chunk.
+        '''
+        if not collapsed.any() and self.count == (first + 1) * nvert:
+            self.remap = self.remap + n * nvert
+            self.coords = rings[-1] if n else self.coords
+            self.count += n * nvert
+            return sweep
+
+        remap = np.empty((n + 1) * nvert, dtype=np.intp)
+        remap[:nvert] = self.remap
+        coords = np.empty((n + 1, nvert, 3))
+        coords[0] = self.coords
+        coords[1:] = rings
+        positions = []
+        for r in range(n):
+            ring = slice((r + 1) * nvert, (r + 2) * nvert)
+            if not collapsed[r]:
+                remap[ring] = np.arange(self.count, self.count + nvert)
+                positions.append(rings[r])
+                self.count += nvert
+                self.apex = None
+            elif self.apex is not None and np.linalg.norm(centers[r] - self.apex_position) <= tolerance:
+                remap[ring] = self.apex
+                coords[r + 1] = self.apex_position
+            else:
+                self.apex = self.count
+                self.apex_position = centers[r]
+                remap[ring] = self.apex
+                coords[r + 1] = centers[r]
+                positions.append(centers[r:r + 1])
+                self.count += 1
+        self.remap = remap[-nvert:]
+        self.coords = coords[-1]
+        positions = np.concatenate(positions) if positions else np.empty((0, 3))
+
+        local = sweep.quads - first * nvert
+        quads = remap[local]
+        same = quads == np.roll(quads, -1, axis=1)
+        ndup = same.sum(axis=1)
+        line = (quads[:, 0] == quads[:, 2]) | (quads[:, 1] == quads[:, 3])
+
+        keep = (ndup == 0) & ~line
+        tri = (ndup == 1) & ~line
+        uvs = sweep.uvs
+
+        polygons = tuple(sweep.polygons) + Triangles(quads, uvs, same, tri)
+        return Sweep(positions, quads[keep], None if uvs is None else uvs[keep], polygons)
+
+'''
+    Make triangles of the quads where tri is set by dropping the corner
+    on the same point as the corner before it. same tells the corners on
+    the same point as the next one. Returns a tuple of the (indices, uvs)
+    group of the triangles, or an empty tuple.
+'''
+def Triangles(quads, uvs, same, tri):
+    if not tri.any():
+        return ()
+    mask = ~np.roll(same[tri], 1, axis=1)
+    tris = quads[tri][mask].reshape(-1, 3)
+    tri_uvs = None
+    if uvs is not None:
+        tri_uvs = uvs[tri][mask].reshape(-1, 3, 2)
+    return ((tris, tri_uvs),)
+
+'''
+    Close the last ring of a sweep, or of the last chunk of it, with a
+    cap of the style. The cap winds against the ring edges of the quads,
+    so it faces the same way as them. start is the index of the first
+    point in positions, which is nvert for a whole sweep. The cap has
+    its own texture coordinates on a disc. An unknown style raises
+    ValueError.
+'''
+def CapSweep(sweep, nvert, style, start):
+    positions = sweep.positions
+    if style not in CAP_STYLES:
+        raise ValueError("unknown cap style {}".format(style))
+    if style == 'none' or nvert < 3 or len(positions) < nvert:
+        return sweep
+    last = start + len(positions) - nvert
+    ring = last + np.arange(nvert)
+    center = positions[-nvert:].mean(axis=0)
+    disc = CapUVs(nvert)
+    uvs = sweep.uvs
+
+    if style == 'ngon':
+        cap = (ring[None, ::-1], None if uvs is None else disc[None, ::-1])
+        return Sweep(positions, sweep.quads, uvs, tuple(sweep.polygons) + (cap,))
+
+    if style == 'fan':
+        k = np.arange(nvert)
+        l = (k + 1) % nvert
+        tris = np.stack((ring[l], ring[k], np.full(nvert, start + len(positions))), axis=-1)
+        fan_uvs = None
+        if uvs is not None:
+            fan_uvs = np.stack((disc[l], disc[k], np.full((nvert, 2), 0.5)), axis=1)
+        return Sweep(np.concatenate((positions, center[None])), sweep.quads, uvs,
+                     tuple(sweep.polygons) + ((tris, fan_uvs),))
+
+    '''
+        Collapse the last ring into its center, which takes the index of
+        the first point of the ring, and make triangles of its quads.
+    '''
+    quads = np.where(sweep.quads >= last, last, sweep.quads)
+    same = quads == np.roll(quads, -1, axis=1)
+    ndup = same.sum(axis=1)
+    keep = ndup == 0
+    polygons = tuple((np.where(indices >= last, last, indices), group_uvs) for indices, group_uvs in sweep.polygons)
+    polygons += Triangles(quads, uvs, same, ndup == 1)
+    return Sweep(np.concatenate((positions[:-nvert], center[None])), quads[keep],
+                 None if uvs is None else uvs[keep], polygons)
+
+'''
+    Texture coordinates of the ring vertices on a cap, on a circle in
+    the unit square. The center of the cap is at (0.5, 0.5).
+'''
+def CapUVs(nvert):
+    angle = np.arange(nvert) * (2.0 * math.pi / nvert)
+    return 0.5 + 0.5 * np.stack((np.cos(angle), np.sin(angle)), axis=-1)
+
+'''
+    Cap of the profile ring of a sweep as a polygon group, for meshes
+    which are not written over the profile polygon itself.
+'''
+def ProfileCap(nvert, uvs):
+    if nvert < 3:
+        return ()
+    return ((np.arange(nvert)[None], CapUVs(nvert)[None] if uvs else None),)
+
+'''
+    Level of detail of a sweep. Every slices-th ring of the full sweep and
+    every stride-th vertex of the profile are kept.
+'''
+LOD = namedtuple('LOD', ['slices', 'stride'])
+
+'''
+    Default chain of levels: the full sweep, half and quarter of the
+    slices, and quarter of the slices with half of the profile.
+'''
+LOD_CHAIN = (LOD(1, 1), LOD(2, 1), LOD(4, 1), LOD(4, 2))
+
+'''
+    Sweep the profile once at full density and derive every level of the
+    chain from the same rings, so the slice transforms are computed only
+    once. The last ring is kept at every level so all levels end at the
+    same place. Returns a list of (profile, sweep) of the levels, where
+    profile is the decimated profile which is ring 0 of the sweep.
+'''
+def BuildLODs(profile, settings, chain=LOD_CHAIN, progress=None):
+    profile = np.asarray(profile, dtype=np.float64).reshape(-1, 3)
+    nvert = len(profile)
+    n = settings.nsid * settings.nrep
+    steps = SliceSteps(profile, settings)
+    if steps is None:
+        steps = np.arange(1, n + 1)
+    rings = TransformProfile(profile, settings, steps, progress).reshape(len(steps), nvert, 3)
+
+    lods = []
+    for lod in chain:
+        level = np.arange(lod.slices - 1, len(steps), lod.slices)
+        if len(level) == 0 or level[-1] != len(steps) - 1:
+            level = np.append(level, len(steps) - 1)
+        stride = max(1, min(lod.stride, nvert // 3))
+        lod_profile = profile[::stride]
+        nv = len(lod_profile)
+
+        positions = rings[level][:, ::stride].reshape(-1, 3)
+        uvs = None
+        if settings.uvs:
+            uvs = CornerUVs(n, nv, settings, steps[level])
+        sweep = Sweep(positions, QuadIndices(len(level), nv), uvs)
+        lods.append((lod_profile, CloseSweep(lod_profile, sweep, settings)))
+    return lods
+
+'''
+    Build the levels of detail of several profiles concurrently like
+    BuildSweeps. Returns the list of BuildLODs of every job.
+'''
+def BuildLODSweeps(jobs, chain=LOD_CHAIN, progress=None):
+    return MapJobs(lambda profile, settings: BuildLODs(profile, settings, chain, progress), jobs)
+
+'''
+    Counts of the problems found when validating profiles and sweeps:
+    degenerate profiles, which are skipped, repeated profile vertices,
+    rings of zero size and polygons left out of the sweep. Problems add
+    up with +.
+'''
+class Problems(namedtuple('Problems', ['degenerate', 'repeated', 'zero', 'skipped'], defaults=[0, 0, 0, 0])):
+    __slots__ = ()
+
+    def __add__(self, other):
+        return Problems(*[a + b for a, b in zip(self, other)])
+
+    def Format(self):
+        messages = []
+        if self.degenerate:
+            messages.append("{} degenerate profiles skipped".format(self.degenerate))
+        if self.repeated:
+            messages.append("{} repeated profile vertices".format(self.repeated))
+        if self.zero:
+            messages.append("{} rings of zero size, use a weld tolerance".format(self.zero))
+        if self.skipped:
+            messages.append("{} duplicate faces skipped".format(self.skipped))
+        return ', '.join(messages)
+
+'''
+    Check a profile before sweeping it. A profile with fewer than three
+    distinct vertices is degenerate. Consecutive vertices on the same
+    position are counted as repeated, and the rings which the scale
+    shrinks within the tolerance, and the weld does not merge, as rings
+    of zero size.
+'''
+def CheckProfile(profile, settings, tolerance=1.0e-6):
+    profile = np.asarray(profile, dtype=np.float64).reshape(-1, 3)
+    if len(np.unique(profile, axis=0)) < 3:
+        return Problems(degenerate=1)
+
+    step = np.linalg.norm(profile - np.roll(profile, -1, axis=0), axis=1)
+    repeated = int((step <= tolerance).sum())
+
+    zero = 0
+    if settings.weld <= 0.0:
+        radius = np.linalg.norm(profile - profile.mean(axis=0), axis=1).max()
+        steps = SliceSteps(profile, settings)
+        if steps is None:
+            steps = np.arange(1, settings.nsid * settings.nrep + 1)
+        scl = max(settings.scl, 1.0e-6)
+        zero = int((radius * np.power(scl, steps / settings.nsid) <= tolerance).sum())
+    return Problems(repeated=repeated, zero=zero)
+
+'''
+    Leave out the polygons of a sweep which a mesh cannot hold, the ones
+    repeating a point and the ones on the same points as an earlier
+    polygon, so making the rest never fails. Returns the sweep and the
+    number of polygons left out.
+'''
+def ValidFaces(sweep):
+    groups = []
+    skipped = 0
+    for indices, uvs in SweepFaces(sweep):
+        rows = np.sort(indices, axis=1)
+        keep = np.zeros(len(indices), dtype=bool)
+        keep[np.unique(rows, axis=0, return_index=True)[1]] = True
+        keep &= ~(rows[:, 1:] == rows[:, :-1]).any(axis=1)
+        skipped += len(indices) - int(keep.sum())
+        groups.append((indices[keep], None if uvs is None else uvs[keep]))
+    if not skipped:
+        return sweep, 0
+    return Sweep(sweep.positions, groups[0][0], groups[0][1], tuple(groups[1:])), skipped
+
+'''
+    Predicted size of the output of sweeps: the new points, the polygons,
+    the polygon corners with UVs and the memory in bytes of the kernel
+    arrays holding them. Welding only removes points and polygons, so
+    with a weld tolerance the counts are an upper bound.
+'''
+class Cost(namedtuple('Cost', ['points', 'polygons', 'uvs', 'bytes'], defaults=[0, 0, 0, 0])):
+    __slots__ = ()
+
+    def __add__(self, other):
+        return Cost(*[a + b for a, b in zip(self, other)])
+
+    def Format(self):
+        return "{} points, {} polygons, {} UVs, {:.1f} MB".format(
+            self.points, self.polygons, self.uvs, self.bytes / (1024.0 * 1024.0))
+
+'''
+    Count the output of sweeping the profile from the profile size and
+    the settings only, before any geometry is made.
+'''
+def SweepCost(profile, settings):
+    profile = np.asarray(profile, dtype=np.float64).reshape(-1, 3)
+    nvert = len(profile)
+    points = SweepSize(profile, settings)
+    polygons = points
+    corners = 4 * polygons
+    if settings.cap != 'none' and nvert >= 3 and points:
+        if settings.cap == 'ngon':
+            polygons += 1
+            corners += nvert
+        elif settings.cap == 'fan':
+            points += 1
+            polygons += nvert
+            corners += 3 * nvert
+        elif settings.cap == 'point':
+            points += 1 - nvert
+            corners -= nvert
+    uvs = corners if settings.uvs else 0
+    return Cost(points, polygons, uvs, points * 24 + corners * 8 + uvs * 16)
+
+'''
+    Limit of the new points of a build and what to do when it is
+    exceeded: 'refuse' to build, 'warn' and build, or 'clamp' the sides
+    per loop to fit. Zero points means no limit.
+'''
+Budget = namedtuple('Budget', ['points', 'policy'])
+
+BUDGET_POLICIES = ('refuse', 'warn', 'clamp')
+DEFAULT_BUDGET = Budget(50000000, 'refuse')
+
+'''
+    Read the budget from the environment variables SEASHELL_BUDGET, the
+    number of points, and SEASHELL_BUDGET_POLICY.
+'''
+def EnvironmentBudget():
+    points = int(float(os.environ.get('SEASHELL_BUDGET', DEFAULT_BUDGET.points)))
+    policy = os.environ.get('SEASHELL_BUDGET_POLICY', DEFAULT_BUDGET.policy).lower()
+    if policy not in BUDGET_POLICIES:
+        policy = DEFAULT_BUDGET.policy
+    return Budget(points, policy)
+
+'''
+    Raised when a build is over its budget with the 'refuse' policy.
+'''
+class BudgetExceeded(Exception):
+    pass
+
+'''
+    Check the cost of the jobs, pairs of the profile and the settings,
+    against the budget. Raises BudgetExceeded with the 'refuse' policy,
+    and with the 'clamp' policy when even 3 sides per loop do not fit.
+    Otherwise returns the settings of every job, with the sides per loop
+    reduced by the 'clamp' policy down to 3 but never raised, their cost,
+    and a message telling what was done, or None within the budget.
+'''
+def ApplyBudget(jobs, budget):
+    settings = [job[1] for job in jobs]
+    cost = sum((SweepCost(*job) for job in jobs), Cost())
+    if budget is None or budget.points <= 0 or cost.points <= budget.points:
+        return settings, cost, None
+
+    message = "{} over the budget of {} points".format(cost.Format(), budget.points)
+    if budget.policy == 'refuse':
+        raise BudgetExceeded(message + ", not built")
+    if budget.policy == 'warn':
+        return settings, cost, message
+
+    ratio = budget.points / float(cost.points)
+    while True:
+        clamped = [job._replace(nsid=min(job.nsid, max(3, int(job.nsid * ratio)))) for job in settings]
+        clamped_cost = sum((SweepCost(profile, job) for (profile, s), job in zip(jobs, clamped)), Cost())
+        if clamped_cost.points <= budget.points or all(job.nsid <= 3 for job in clamped):
+            break
+        ratio *= 0.9
+    if clamped_cost.points > budget.points:
+        raise BudgetExceeded(message + ", not built as 3 sides per loop still make {}".format(clamped_cost.Format()))
+    sides = sorted(set(job.nsid for job in clamped))
+    message += ", sides per loop reduced to {} making {}".format(
+        ', '.join(str(nsid) for nsid in sides), clamped_cost.Format())
+    return clamped, clamped_cost, message
+
+'''
+    Choose a coarse resolution for interactive previews. The sides per
+    loop are reduced first and then every stride-th profile vertex is
+    kept, so that the sweep makes at most about budget new vertices.
+    Returns the sides per loop and the stride of the profile. A budget
+    below one vertex, such as the share of a face when there are more
+    faces than vertices in the budget, gives the coarsest resolution.
+'''
+def PreviewResolution(nvert, settings, budget):
+    budget = max(1, budget)
+    nsid = settings.nsid
+    if nsid * settings.nrep * nvert <= budget:
+        return nsid, 1
+
+    nsid = min(nsid, max(3, budget // (settings.nrep * nvert)))
+    stride = math.ceil(nsid * settings.nrep * nvert / budget)
+    return nsid, max(1, min(stride, nvert // 3))
+
+'''
+    Join the sweeps of several profiles into a single set of buffers.
+    Unlike a single sweep, the positions start with the profile ring, so
+    the polygon indices simply refer to the rows of the joined positions.
+'''
+def JoinSweeps(profiles, sweeps):
+    positions = []
+    groups = {}
+    base = 0
+    for profile, sweep in zip(profiles, sweeps):
+        profile = np.asarray(profile, dtype=np.float64).reshape(-1, 3)
+        positions.append(profile)
+        positions.append(sweep.positions)
+        for indices, uvs in SweepFaces(sweep):
+            group = groups.setdefault(indices.shape[1], ([], []))
+            group[0].append(indices + base)
+            if uvs is not None:
+                group[1].append(uvs)
+        base += len(profile) + len(sweep.positions)
+
+    if not positions:
+        return Sweep(np.empty((0, 3)), np.empty((0, 4), dtype=np.intp), None)
+
+    faces = {}
+    for size, (indices, uvs) in groups.items():
+        faces[size] = (np.concatenate(indices), np.concatenate(uvs) if uvs else None)
+    quads, uvs = faces.pop(4, (np.empty((0, 4), dtype=np.intp), None))
+    return Sweep(np.concatenate(positions), quads, uvs, tuple(faces.values()))
+
+'''
+    All polygons of a sweep as groups of (indices, uvs) arrays, the quads
+    first.
+'''
+def SweepFaces(sweep):
+    return [(sweep.quads, sweep.uvs)] + list(sweep.polygons)
+
+'''
+    Split the texture coordinates of the polygon corners of a sweep into
+    values shared by the points and values of single corners. Every new
+    point takes the value of the first corner on it, and only the corners
+    with another value and the corners on the profile, which keeps its
+    own UVs, are left to be written to the polygons. Returns the values
+    of the new points and a list of the polygon index, in the order of
+    SweepFaces, and the list of (point index, uv) of its split corners.
+    known holds the values already written to the last points of ring 0,
+    such as the last ring of the previous chunk, and their corners are
+    only split when they differ from them.
+'''
+def SharedUVs(nprofile, sweep, known=None):
+    faces = [face for face in SweepFaces(sweep) if len(face[0])]
+    if not faces:
+        return np.zeros((len(sweep.positions), 2)), []
+    indices = np.concatenate([face[0].ravel() for face in faces])
+    uvs = np.concatenate([face[1].reshape(-1, 2) for face in faces])
+    sizes = np.concatenate([np.full(len(face[0]), face[0].shape[1]) for face in faces])
+    polygon = np.repeat(np.arange(len(sizes)), sizes)
+
+    nknown = 0 if known is None else len(known)
+    values = np.zeros((nprofile + len(sweep.positions), 2))
+    values[nprofile - nknown:nprofile] = known if nknown else 0.0
+    points, first = np.unique(indices, return_index=True)
+    new = points >= nprofile
+    values[points[new]] = uvs[first[new]]
+    split = (indices < nprofile - nknown) | (np.abs(values[indices] - uvs) > 1.0e-9).any(axis=1)
+
+    corners = []
+    last = -1
+    for c in np.flatnonzero(split).tolist():
+        if polygon[c] != last:
+            last = polygon[c]
+            corners.append((int(last), []))
+        corners[-1][1].append((int(indices[c]), uvs[c].tolist()))
+    return values[nprofile:], corners
+
+'''
+    Keyed cache of the last sweeps. The geometry is keyed by the profile
+    coordinates and the parameters changing the shape, and the UVs by the
+    parameters changing the texture coordinates only, so a change of the
+    wrap amounts reuses the positions and the quads.
+'''
+class SweepCache(object):
+    def __init__(self, maxsize=16):
+        self.maxsize = maxsize
+        self.geometry = OrderedDict()
+        self.corners = OrderedDict()
+        self.lock = threading.Lock()
+
+    def BuildSweep(self, profile, settings, progress=None):
+        profile = np.ascontiguousarray(profile, dtype=np.float64).reshape(-1, 3)
+        nvert = len(profile)
+        n = settings.nsid * settings.nrep
+        steps = SliceSteps(profile, settings)
+
+        key = (profile.tobytes(), settings.axis, settings.nrep, settings.nsid, settings.off, settings.scl, settings.adapt)
+        geometry = self.Lookup(self.geometry, key)
+        if geometry is None:
+            positions = TransformProfile(profile, settings, steps, progress)
+            geometry = (positions, QuadIndices(n if steps is None else len(steps), nvert))
+            self.Store(self.geometry, key, geometry)
+        elif progress is not None:
+            progress.Step(len(geometry[0]))
+
+        uvs = None
+        if settings.uvs:
+            key = (n, nvert, settings.uwrp, settings.vwrp, None if steps is None else steps.tobytes())
+            uvs = self.Lookup(self.corners, key)
+            if uvs is None:
+                uvs = CornerUVs(n, nvert, settings, steps)
+                self.Store(self.corners, key, uvs)
+
+        return CloseSweep(profile, Sweep(geometry[0], geometry[1], uvs), settings)
+
+    def Lookup(self, table, key):
+        with self.lock:
+            value = table.get(key)
+            if value is not None:
+                table.move_to_end(key)
+            return value
+
+    def Store(self, table, key, value):
+        for array in value if isinstance(value, tuple) else (value,):
+            array.setflags(write=False)
+        with self.lock:
+            table[key] = value
+            while len(table) > self.maxsize:
+                table.popitem(last=False)
+
+    def Clear(self):
+        with self.lock:
+            self.geometry.clear()
+            self.corners.clear()
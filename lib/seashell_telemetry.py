@@ -0,0 +1,170 @@
+#python
+
+'''
+
+    Opt-in timing telemetry of the seashell servers. It is enabled by
+    setting the environment variable SEASHELL_PROFILE to 1, or by calling
+    seashell_telemetry.Enable() from the Python console of Modo.
+
+    Every server call records the time spent in each stage (profile
+    enumeration, sweep computation, point and polygon creation, UV writes
+    and applying the edits) and the number of elements it made. The last
+    calls are kept as a rolling history, which is summarized by Summary()
+    and written as JSON by Dump(). When SEASHELL_PROFILE_FILE is set, the
+    summary is written to that file after every call.
+
+'''
+
+import json
+import os
+import threading
+import time
+from collections import deque
+
+_enabled = os.environ.get('SEASHELL_PROFILE', '0') not in ('', '0')
+_history = deque(maxlen=int(os.environ.get('SEASHELL_PROFILE_HISTORY', '100')))
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def Enable(enabled=True):
+    global _enabled
+    _enabled = enabled
+
+
+def Enabled():
+    return _enabled
+
+
+'''
+    Timings and counts of a single server call.
+'''
+class Call(object):
+    def __init__(self, server):
+        self.server = server
+        self.times = {}
+        self.counts = {}
+        self.start = time.perf_counter()
+
+    def Stage(self, name):
+        return _Timer(self, name)
+
+    def Count(self, name, count):
+        self.counts[name] = self.counts.get(name, 0) + count
+
+    def Format(self):
+        times = ' '.join('{}={:.2f}ms'.format(k, v * 1000.0) for k, v in self.times.items())
+        counts = ' '.join('{}={}'.format(k, v) for k, v in self.counts.items())
+        return '{}: {} {}'.format(self.server, times, counts)
+
+
+class _Timer(object):
+    __slots__ = ('call', 'name', 'start')
+
+    def __init__(self, call, name):
+        self.call = call
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        times = self.call.times
+        times[self.name] = times.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+
+class _NoTimer(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+_no_timer = _NoTimer()
+
+
+'''
+    Start recording a call of the server in the current thread. Returns
+    None when the telemetry is disabled.
+'''
+def Begin(server):
+    if not _enabled:
+        return None
+    call = Call(server)
+    _local.call = call
+    return call
+
+'''
+    Finish recording the call and add it to the history. The one line
+    summary of the call is passed to log when it is given.
+'''
+def End(call, log=None):
+    if call is None:
+        return
+    call.times['total'] = time.perf_counter() - call.start
+    _local.call = None
+    with _lock:
+        _history.append(call)
+
+    if log:
+        log(call.Format())
+    path = os.environ.get('SEASHELL_PROFILE_FILE')
+    if path:
+        Dump(path)
+
+'''
+    Time a stage of the call recorded in the current thread. This is a
+    no-op when nothing is recorded.
+'''
+def Stage(name):
+    call = getattr(_local, 'call', None)
+    if call is None:
+        return _no_timer
+    return call.Stage(name)
+
+def Count(name, count):
+    call = getattr(_local, 'call', None)
+    if call is not None:
+        call.Count(name, count)
+
+'''
+    Summarize the history per server: the number of calls, the total,
+    mean and max time of every stage in milliseconds and the total
+    counts.
+'''
+def Summary():
+    with _lock:
+        calls = list(_history)
+
+    summary = {}
+    for call in calls:
+        entry = summary.setdefault(call.server, {'calls': 0, 'stages': {}, 'counts': {}})
+        entry['calls'] += 1
+        for name, seconds in call.times.items():
+            stage = entry['stages'].setdefault(name, {'total': 0.0, 'max': 0.0})
+            stage['total'] += seconds * 1000.0
+            stage['max'] = max(stage['max'], seconds * 1000.0)
+        for name, count in call.counts.items():
+            entry['counts'][name] = entry['counts'].get(name, 0) + count
+
+    for entry in summary.values():
+        for stage in entry['stages'].values():
+            stage['mean'] = stage['total'] / entry['calls']
+    return summary
+
+'''
+    Return the summary as JSON text, and write it to path when it is
+    given.
+'''
+def Dump(path=None):
+    text = json.dumps(Summary(), indent=2, sort_keys=True)
+    if path:
+        with open(path, 'w') as f:
+            f.write(text)
+    return text
+
+def Clear():
+    with _lock:
+        _history.clear()
@@ -7,13 +7,23 @@
 
 '''
 
+import os
+import sys
 import lx
 import lxifc
 import lxu.command
 import lxu.select
 from lxifc import UIValueHints, Visitor
 
-import seashell
+'''
+    The seashell modules are kept in the lib folder of the kit, which Modo
+    does not load at startup unlike the servers in lxserv.
+'''
+LIB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lib")
+if LIB_PATH not in sys.path:
+    sys.path.append(LIB_PATH)
+
+import seashell_telemetry
 from collections import namedtuple
 
 DynamicAttribute = namedtuple('DynamicAttribute', ['name', 'index'])
@@ -28,11 +38,32 @@ ATTR_UWRP = DynamicAttribute('uwrap',  6)
 ATTR_VWRP = DynamicAttribute('vwrap',  7)
 ATTR_VROT = DynamicAttribute('vrot',   8)
 ATTR_NAME = DynamicAttribute('name',   9)
+ATTR_WELD = DynamicAttribute('weld',   10)
+ATTR_ADAPT = DynamicAttribute('adapt', 11)
+ATTR_LODS = DynamicAttribute('lods',   12)
+ATTR_CAP  = DynamicAttribute('cap',    13)
+
+'''
+    The seashell modules load NumPy, so they are imported by Load when
+    the first command is made rather than when Modo loads the kit. The
+    on-disk cache of the sweeps is opened then when SEASHELL_CACHE_DIR
+    is set.
+'''
+seashell = seashell_cache = seashell_core = sweep_cache = None
+
+def Load():
+    global seashell, seashell_cache, seashell_core, sweep_cache
+    if seashell_core is None:
+        import seashell
+        import seashell_cache
+        import seashell_core
+        sweep_cache = seashell_cache.Open()
 
 
 class Seashell_Cmd(lxu.command.BasicCommand):
     def __init__(self):
         lxu.command.BasicCommand.__init__(self)
+        Load()
     
         self.dyna_Add(ATTR_AXIS.name, lx.symbol.sTYPE_AXIS)
         self.dyna_Add(ATTR_NREP.name, lx.symbol.sTYPE_INTEGER)
@@ -44,6 +75,12 @@ class Seashell_Cmd(lxu.command.BasicCommand):
         self.dyna_Add(ATTR_VWRP.name, lx.symbol.sTYPE_FLOAT)
         self.dyna_Add(ATTR_VROT.name, lx.symbol.sTYPE_BOOLEAN)
         self.dyna_Add(ATTR_NAME.name, lx.symbol.sTYPE_STRING)
+        self.dyna_Add(ATTR_WELD.name, lx.symbol.sTYPE_DISTANCE)
+        self.dyna_Add(ATTR_ADAPT.name, lx.symbol.sTYPE_DISTANCE)
+        self.dyna_Add(ATTR_LODS.name, lx.symbol.sTYPE_INTEGER)
+        self.dyna_Add(ATTR_CAP.name, lx.symbol.sTYPE_INTEGER)
+
+        self.uv_name = seashell.Settings().name
 
         '''
             Get UV texture name from selection packet if UV texture map is
@@ -55,30 +92,39 @@ class Seashell_Cmd(lxu.command.BasicCommand):
         for i in range(sel_svc.Count(selTypeCode)):
             packet = sel_svc.ByIndex(selTypeCode, i)
             if transPacket.Type (packet) == lx.symbol.i_VMAP_TEXTUREUV:
-                seashell.Settings.name = transPacket.Name(packet)
+                self.uv_name = transPacket.Name(packet)
                 break
 
     def cmd_DialogInit (self):
+        defaults = seashell.Settings(name=self.uv_name)
         if not self.dyna_IsSet (ATTR_AXIS.index):
-            self.attr_SetInt (ATTR_AXIS.index, seashell.Settings.axis)
+            self.attr_SetInt (ATTR_AXIS.index, defaults.axis)
         if not self.dyna_IsSet (ATTR_NREP.index):
-            self.attr_SetInt (ATTR_NREP.index, seashell.Settings.nrep)
+            self.attr_SetInt (ATTR_NREP.index, defaults.nrep)
         if not self.dyna_IsSet (ATTR_NSID.index):
-            self.attr_SetInt (ATTR_NSID.index, seashell.Settings.nsid)
+            self.attr_SetInt (ATTR_NSID.index, defaults.nsid)
         if not self.dyna_IsSet (ATTR_OFF.index):
-            self.attr_SetInt (ATTR_OFF.index, seashell.Settings.off)
+            self.attr_SetInt (ATTR_OFF.index, defaults.off)
         if not self.dyna_IsSet (ATTR_SCL.index):
-            self.attr_SetFlt (ATTR_SCL.index, seashell.Settings.scl)
+            self.attr_SetFlt (ATTR_SCL.index, defaults.scl)
         if not self.dyna_IsSet (ATTR_TXUV.index):
-            self.attr_SetInt (ATTR_TXUV.index, seashell.Settings.uvs)
+            self.attr_SetInt (ATTR_TXUV.index, defaults.uvs)
         if not self.dyna_IsSet (ATTR_UWRP.index):
-            self.attr_SetFlt (ATTR_UWRP.index, seashell.Settings.uwrp)
+            self.attr_SetFlt (ATTR_UWRP.index, defaults.uwrp)
         if not self.dyna_IsSet (ATTR_VWRP.index):
-            self.attr_SetFlt (ATTR_VWRP.index, seashell.Settings.vwrp)
+            self.attr_SetFlt (ATTR_VWRP.index, defaults.vwrp)
         if not self.dyna_IsSet (ATTR_VROT.index):
-            self.attr_SetInt (ATTR_VROT.index, seashell.Settings.vrot)
+            self.attr_SetInt (ATTR_VROT.index, defaults.vrot)
         if not self.dyna_IsSet (ATTR_NAME.index):
-            self.attr_SetString (ATTR_NAME.index, seashell.Settings.name)
+            self.attr_SetString (ATTR_NAME.index, defaults.name)
+        if not self.dyna_IsSet (ATTR_WELD.index):
+            self.attr_SetFlt (ATTR_WELD.index, defaults.weld)
+        if not self.dyna_IsSet (ATTR_ADAPT.index):
+            self.attr_SetFlt (ATTR_ADAPT.index, defaults.adapt)
+        if not self.dyna_IsSet (ATTR_LODS.index):
+            self.attr_SetInt (ATTR_LODS.index, 1)
+        if not self.dyna_IsSet (ATTR_CAP.index):
+            self.attr_SetInt (ATTR_CAP.index, seashell_core.CAP_STYLES.index(defaults.cap))
 
     def cmd_Flags(self):
         return lx.symbol.fCMD_MODEL | lx.symbol.fCMD_UNDO
@@ -100,7 +146,16 @@ class Seashell_Cmd(lxu.command.BasicCommand):
 
     def arg_UIHints(self, index, hints):
         if index == ATTR_NREP.index or index == ATTR_NSID.index or index == ATTR_OFF.index:
-            hints.MinInt(1) 
+            hints.MinInt(1)
+        elif index == ATTR_WELD.index or index == ATTR_ADAPT.index:
+            hints.MinFloat(0.0)
+        elif index == ATTR_LODS.index:
+            hints.MinInt(1)
+            hints.MaxInt(len(seashell_core.LOD_CHAIN))
+
+    def arg_UIValueHints(self, index):
+        if index == ATTR_CAP.index:
+            return seashell.CapHints()
 
     def cmd_ArgEnable(self, index):
         if index == ATTR_UWRP.index or index == ATTR_VWRP.index or index == ATTR_VROT.index or index == ATTR_NAME.index:
@@ -110,20 +165,28 @@ class Seashell_Cmd(lxu.command.BasicCommand):
                 return False
         return True
 
+    def GetSettings(self):
+        return seashell.Settings(
+            axis = self.attr_GetInt(ATTR_AXIS.index),
+            nrep = self.attr_GetInt(ATTR_NREP.index),
+            nsid = self.attr_GetInt(ATTR_NSID.index),
+            off = self.attr_GetFlt(ATTR_OFF.index),
+            uvs = self.attr_GetInt(ATTR_TXUV.index),
+            uwrp = self.attr_GetFlt(ATTR_UWRP.index),
+            vwrp = self.attr_GetFlt(ATTR_VWRP.index),
+            scl = self.attr_GetFlt(ATTR_SCL.index),
+            vrot = self.attr_GetInt(ATTR_VROT.index),
+            name = self.attr_GetString(ATTR_NAME.index),
+            weld = self.attr_GetFlt(ATTR_WELD.index),
+            adapt = self.attr_GetFlt(ATTR_ADAPT.index),
+            cap = seashell_core.CAP_STYLES[self.attr_GetInt(ATTR_CAP.index)])
+
     def basic_Execute(self, msg, flags):
         '''
             Get all attributes
         '''
-        seashell.Settings.axis = self.attr_GetInt(ATTR_AXIS.index)
-        seashell.Settings.nrep = self.attr_GetInt(ATTR_NREP.index)
-        seashell.Settings.nsid = self.attr_GetInt(ATTR_NSID.index)
-        seashell.Settings.off = self.attr_GetFlt(ATTR_OFF.index)
-        seashell.Settings.scl = self.attr_GetFlt(ATTR_SCL.index)
-        seashell.Settings.uvs = self.attr_GetInt(ATTR_TXUV.index)
-        seashell.Settings.uwrp = self.attr_GetFlt(ATTR_UWRP.index)
-        seashell.Settings.vwrp = self.attr_GetFlt(ATTR_VWRP.index)
-        seashell.Settings.vrot = self.attr_GetInt(ATTR_VROT.index)
-        seashell.Settings.name = self.attr_GetString(ATTR_NAME.index)
+        settings = self.GetSettings()
+        lods = self.attr_GetInt(ATTR_LODS.index)
 
         layer_svc = lx.service.Layer()
         mesh_svc = lx.service.Mesh()
@@ -136,50 +199,107 @@ class Seashell_Cmd(lxu.command.BasicCommand):
         if layer_scan.test() == False:
             return
 
-        for n in range(layer_scan.Count()):
-            mesh_loc = lx.object.Mesh(layer_scan.MeshEdit(n))
+        call = seashell_telemetry.Begin('seashell.command')
+        try:
+            layers = []
+            for n in range(layer_scan.Count()):
+                mesh_loc = lx.object.Mesh(layer_scan.MeshEdit(n))
 
-            if mesh_loc.test() == False:
-                continue
+                if mesh_loc.test() == False:
+                    continue
 
-            if mesh_loc.PolygonCount() == 0:
-                continue
+                if mesh_loc.PolygonCount() == 0:
+                    continue
 
-            map = None
-            if seashell.Settings.uvs:
-                vmap_loc = lx.object.MeshMap(mesh_loc.MeshMapAccessor())
-                map = vmap_loc.New(lx.symbol.i_VMAP_TEXTUREUV, seashell.Settings.name)
+                map = None
+                if settings.uvs:
+                    vmap_loc = lx.object.MeshMap(mesh_loc.MeshMapAccessor())
+                    map = vmap_loc.New(lx.symbol.i_VMAP_TEXTUREUV, settings.name)
 
-            polygon_loc = lx.object.Polygon(mesh_loc.PolygonAccessor())
-            point_loc = lx.object.Point(mesh_loc.PointAccessor())
+                polygon_loc = lx.object.Polygon(mesh_loc.PolygonAccessor())
+                point_loc = lx.object.Point(mesh_loc.PointAccessor())
 
-            if polygon_loc.test() == False:
-                continue
+                if polygon_loc.test() == False:
+                    continue
 
-            '''
-                Store the shape in the foreground mesh layer as the
-                profile.
-            '''
-            mark_mode_selected = mesh_svc.ModeCompose (lx.symbol.sMARK_SELECT, None)
-            vis = seashell.PolygonVisitor (polygon_loc, point_loc, map)
-            polygon_loc.Enumerate (mark_mode_selected, vis, 0)
+                '''
+                    Store the shape in the foreground mesh layer as the
+                    profile.
+                '''
+                mark_mode_selected = mesh_svc.ModeCompose (lx.symbol.sMARK_SELECT, None)
+                vis = seashell.PolygonVisitor (polygon_loc, point_loc, map)
+                with seashell_telemetry.Stage('enumerate'):
+                    polygon_loc.Enumerate (mark_mode_selected, vis, 0)
+
+                layers.append((n, vis))
 
             '''
-                Build seashell polygons
+                Build seashell polygons of all layers at once. With levels of
+                detail, the full level is built into the layers and the
+                others are kept to be written into new mesh items. The sweeps
+                are computed in the background under a progress monitor, and
+                when the user aborts it the edits are not applied.
             '''
-            seashell.Build(vis)
+            levels = []
+            monitor = seashell.Monitor('Seashell')
+            try:
+                if lods > 1:
+                    levels = seashell.BuildLODs([vis for n, vis in layers], settings, seashell_core.LOD_CHAIN[:lods], monitor)
+                else:
+                    seashell.BuildAll([vis for n, vis in layers], settings, sweep_cache, monitor=monitor)
+            except seashell_core.Cancelled:
+                return
+            except seashell_core.BudgetExceeded as error:
+                lx.out("seashell: {}".format(error))
+                return
+            finally:
+                monitor.Release()
+
+            for n, vis in layers:
+                '''
+                    We need to tell modo that we have made edits to this mesh.
+                '''
+                layer_scan.SetMeshChange(n, lx.symbol.f_MESHEDIT_GEOMETRY)
 
             '''
-                Before we move on to the next layer, we need to tell modo that we
-                have made edits to this mesh.
+                Finally, we need to call apply on the LayerScan interface. This tells
+                modo to perform all the mesh edits.
             '''
-            layer_scan.SetMeshChange(n, lx.symbol.f_MESHEDIT_GEOMETRY)
+            with seashell_telemetry.Stage('apply'):
+                layer_scan.Apply()
+
+            for (n, vis), layer_levels in zip(layers, levels):
+                with seashell_telemetry.Stage('lods'):
+                    self.WriteLODs(lx.object.Item(layer_scan.MeshItem(n)), layer_levels, settings)
+        finally:
+            seashell_telemetry.End(call, lx.out)
+
+    '''
+        Write the levels of detail of a layer into new mesh items. They
+        are parented to the source mesh item to share its transform and
+        named after it with the level number.
+    '''
+    def WriteLODs(self, item, levels, settings):
+        scene = lx.object.Scene(item.Context())
+        mesh_type = lx.service.Scene().ItemTypeLookup(lx.symbol.sITYPE_MESH)
+        chan_write = lx.object.ChannelWrite(scene.Channels(lx.symbol.s_ACTIONLAYER_EDIT, 0.0))
+
+        for i, level in enumerate(levels, 1):
+            lod_item = scene.ItemAdd(mesh_type)
+            lod_item.SetName('{} LOD{}'.format(item.UniqueName(), i))
+            lod_item.SetParent(item, -1)
+            mesh_loc = lx.object.Mesh(chan_write.ValueObj(lod_item, lod_item.ChannelLookup(lx.symbol.sICHAN_MESH_MESH)))
 
-        '''
-            Finally, we need to call apply on the LayerScan interface. This tells
-            modo to perform all the mesh edits.
-        '''
-        layer_scan.Apply()
+            map = None
+            if settings.uvs:
+                vmap_loc = lx.object.MeshMap(mesh_loc.MeshMapAccessor())
+                map = vmap_loc.New(lx.symbol.i_VMAP_TEXTUREUV, settings.name)
+
+            polygon_loc = lx.object.Polygon(mesh_loc.PolygonAccessor())
+            point_loc = lx.object.Point(mesh_loc.PointAccessor())
+            vis = seashell.PolygonVisitor (polygon_loc, point_loc, map)
+            seashell.WriteLOD(vis, level, settings)
+            mesh_loc.SetMeshEdits(lx.symbol.f_MESHEDIT_GEOMETRY)
 
 '''
     "Blessing" the class promotes it to a fist class server. This basically
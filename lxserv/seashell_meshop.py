@@ -7,13 +7,23 @@
 
 '''
 
+import os
+import sys
 import lx
 import lxifc
 import lxu.attributes
 import lxu.vector
 from lxifc import UIValueHints, Visitor
 
-import seashell
+'''
+    The seashell modules are kept in the lib folder of the kit, which Modo
+    does not load at startup unlike the servers in lxserv.
+'''
+LIB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lib")
+if LIB_PATH not in sys.path:
+    sys.path.append(LIB_PATH)
+
+import seashell_telemetry
 
 from collections import namedtuple
 DynamicAttribute = namedtuple('DynamicAttribute', ['name', 'index'])
@@ -28,10 +38,33 @@ ATTR_UWRP = DynamicAttribute('uwrap',  6)
 ATTR_VWRP = DynamicAttribute('vwrap',  7)
 ATTR_VROT = DynamicAttribute('vrot',   8)
 ATTR_NAME = DynamicAttribute('name',   9)
+ATTR_WELD = DynamicAttribute('weld',   10)
+ATTR_ADAPT = DynamicAttribute('adapt', 11)
+ATTR_CAP  = DynamicAttribute('cap',    12)
+
+'''
+    Meshops are evaluated again on every change of the mesh stack, and
+    the profile and the attributes are mostly the same as last time.
+    With SEASHELL_CACHE_DIR set, the sweeps are also kept on disk, so
+    reloading a scene does not build them again.
+
+    The seashell modules load NumPy, so they are imported by Load when
+    the first meshop is made rather than when Modo loads the kit.
+'''
+seashell = seashell_cache = seashell_core = sweep_cache = None
+
+def Load():
+    global seashell, seashell_cache, seashell_core, sweep_cache
+    if seashell_core is None:
+        import seashell
+        import seashell_cache
+        import seashell_core
+        sweep_cache = seashell_cache.Open(seashell_core.SweepCache())
 
 class Seashell_MeshOp(lxifc.MeshOperation, lxu.attributes.DynamicAttributes):
     def __init__(self):
         lxu.attributes.DynamicAttributes.__init__(self)
+        Load()
     
         self.dyna_Add(ATTR_AXIS.name, lx.symbol.sTYPE_AXIS)
         self.dyna_Add(ATTR_NREP.name, lx.symbol.sTYPE_INTEGER)
@@ -43,33 +76,51 @@ class Seashell_MeshOp(lxifc.MeshOperation, lxu.attributes.DynamicAttributes):
         self.dyna_Add(ATTR_VWRP.name, lx.symbol.sTYPE_FLOAT)
         self.dyna_Add(ATTR_VROT.name, lx.symbol.sTYPE_BOOLEAN)
         self.dyna_Add(ATTR_NAME.name, lx.symbol.sTYPE_STRING)
+        self.dyna_Add(ATTR_WELD.name, lx.symbol.sTYPE_DISTANCE)
+        self.dyna_Add(ATTR_ADAPT.name, lx.symbol.sTYPE_DISTANCE)
+        self.dyna_Add(ATTR_CAP.name, lx.symbol.sTYPE_INTEGER)
     
-        self.attr_SetInt (ATTR_AXIS.index, seashell.Settings.axis)
-        self.attr_SetInt (ATTR_NREP.index, seashell.Settings.nrep)
-        self.attr_SetInt (ATTR_NSID.index, seashell.Settings.nsid)
-        self.attr_SetFlt (ATTR_OFF.index, seashell.Settings.off)
-        self.attr_SetFlt (ATTR_SCL.index, seashell.Settings.scl)
-        self.attr_SetInt (ATTR_TXUV.index, seashell.Settings.uvs)
-        self.attr_SetFlt (ATTR_UWRP.index, seashell.Settings.uwrp)
-        self.attr_SetFlt (ATTR_VWRP.index, seashell.Settings.vwrp)
-        self.attr_SetInt (ATTR_VROT.index, seashell.Settings.vrot)
-        self.attr_SetString (ATTR_NAME.index, seashell.Settings.name)
+        defaults = seashell.Settings()
+        self.attr_SetInt (ATTR_AXIS.index, defaults.axis)
+        self.attr_SetInt (ATTR_NREP.index, defaults.nrep)
+        self.attr_SetInt (ATTR_NSID.index, defaults.nsid)
+        self.attr_SetFlt (ATTR_OFF.index, defaults.off)
+        self.attr_SetFlt (ATTR_SCL.index, defaults.scl)
+        self.attr_SetInt (ATTR_TXUV.index, defaults.uvs)
+        self.attr_SetFlt (ATTR_UWRP.index, defaults.uwrp)
+        self.attr_SetFlt (ATTR_VWRP.index, defaults.vwrp)
+        self.attr_SetInt (ATTR_VROT.index, defaults.vrot)
+        self.attr_SetString (ATTR_NAME.index, defaults.name)
+        self.attr_SetFlt (ATTR_WELD.index, defaults.weld)
+        self.attr_SetFlt (ATTR_ADAPT.index, defaults.adapt)
+        self.attr_SetInt (ATTR_CAP.index, seashell_core.CAP_STYLES.index(defaults.cap))
          
 
+    def GetSettings(self):
+        return seashell.Settings(
+            axis = self.attr_GetInt(ATTR_AXIS.index),
+            nrep = self.attr_GetInt(ATTR_NREP.index),
+            nsid = self.attr_GetInt(ATTR_NSID.index),
+            off = self.attr_GetFlt(ATTR_OFF.index),
+            uvs = self.attr_GetInt(ATTR_TXUV.index),
+            uwrp = self.attr_GetFlt(ATTR_UWRP.index),
+            vwrp = self.attr_GetFlt(ATTR_VWRP.index),
+            scl = self.attr_GetFlt(ATTR_SCL.index),
+            vrot = self.attr_GetInt(ATTR_VROT.index),
+            name = self.attr_GetString(ATTR_NAME.index),
+            weld = self.attr_GetFlt(ATTR_WELD.index),
+            adapt = self.attr_GetFlt(ATTR_ADAPT.index),
+            cap = seashell_core.CAP_STYLES[self.attr_GetInt(ATTR_CAP.index)])
+
+    def arg_UIValueHints(self, index):
+        if index == ATTR_CAP.index:
+            return seashell.CapHints()
+
     def mop_Evaluate(self, mesh_obj, type, mode):
         '''
             Get all attributes
         '''
-        seashell.Settings.axis = self.attr_GetInt(ATTR_AXIS.index)
-        seashell.Settings.nrep = self.attr_GetInt(ATTR_NREP.index)
-        seashell.Settings.nsid = self.attr_GetInt(ATTR_NSID.index)
-        seashell.Settings.off = self.attr_GetFlt(ATTR_OFF.index)
-        seashell.Settings.scl = self.attr_GetFlt(ATTR_SCL.index)
-        seashell.Settings.uvs = self.attr_GetInt(ATTR_TXUV.index)
-        seashell.Settings.uwrp = self.attr_GetFlt(ATTR_UWRP.index)
-        seashell.Settings.vwrp = self.attr_GetFlt(ATTR_VWRP.index)
-        seashell.Settings.vrot = self.attr_GetInt(ATTR_VROT.index)
-        seashell.Settings.name = self.attr_GetString(ATTR_NAME.index)
+        settings = self.GetSettings()
 
         mesh_svc = lx.service.Mesh()
         mesh_loc = lx.object.Mesh (mesh_obj)
@@ -78,34 +129,45 @@ class Seashell_MeshOp(lxifc.MeshOperation, lxu.attributes.DynamicAttributes):
             return
 
         map = None
-        if seashell.Settings.uvs:
+        if settings.uvs:
             vmap_loc = lx.object.MeshMap(mesh_loc.MeshMapAccessor())
-            map = vmap_loc.New(lx.symbol.i_VMAP_TEXTUREUV, seashell.Settings.name)
+            map = vmap_loc.New(lx.symbol.i_VMAP_TEXTUREUV, settings.name)
 
         polygon_loc = lx.object.Polygon(mesh_loc.PolygonAccessor())
         point_loc = lx.object.Point(mesh_loc.PointAccessor())
         
         if polygon_loc.test() == False:
             return
-        
-        '''
-            Store the shape in the foreground mesh layer as the
-            profile.
-        '''
-        mark_mode_selected = mesh_svc.ModeCompose (lx.symbol.sMARK_SELECT, None)
-        vis = seashell.PolygonVisitor (polygon_loc, point_loc, map)
-        polygon_loc.Enumerate (mark_mode_selected, vis, 0)
-        
-        '''
-            Build seashell polygons
-        '''
-        seashell.Build(vis)
 
-        '''
-        Before we move on to the next layer, we need to tell modo that we
-        have made edits to this mesh.
-        '''
-        mesh_loc.SetMeshEdits (lx.symbol.f_MESHEDIT_GEOMETRY)
+        call = seashell_telemetry.Begin('seashell.meshop')
+        try:
+            '''
+                Store the shape in the foreground mesh layer as the
+                profile.
+            '''
+            mark_mode_selected = mesh_svc.ModeCompose (lx.symbol.sMARK_SELECT, None)
+            vis = seashell.PolygonVisitor (polygon_loc, point_loc, map)
+            with seashell_telemetry.Stage('enumerate'):
+                polygon_loc.Enumerate (mark_mode_selected, vis, 0)
+
+            '''
+                Build seashell polygons. A build over the budget leaves the
+                mesh as it is.
+            '''
+            try:
+                seashell.Build(vis, settings, sweep_cache)
+            except seashell_core.BudgetExceeded as error:
+                lx.out("seashell: {}".format(error))
+                return
+
+            '''
+            Before we move on to the next layer, we need to tell modo that we
+            have made edits to this mesh.
+            '''
+            with seashell_telemetry.Stage('apply'):
+                mesh_loc.SetMeshEdits (lx.symbol.f_MESHEDIT_GEOMETRY)
+        finally:
+            seashell_telemetry.End(call, lx.out)
 
 '''
     "Blessing" the class promotes it to a fist class server. This basically
@@ -7,12 +7,22 @@
 
 '''
 
+import os
+import sys
 import lx
 import lxifc
 import lxu.attributes
 from lxifc import UIValueHints, Visitor
 
-import seashell
+'''
+    The seashell modules are kept in the lib folder of the kit, which Modo
+    does not load at startup unlike the servers in lxserv.
+'''
+LIB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lib")
+if LIB_PATH not in sys.path:
+    sys.path.append(LIB_PATH)
+
+import seashell_telemetry
 
 from collections import namedtuple
 DynamicAttribute = namedtuple('DynamicAttribute', ['name', 'index'])
@@ -27,11 +37,36 @@ ATTR_UWRP = DynamicAttribute('uwrap',  6)
 ATTR_VWRP = DynamicAttribute('vwrap',  7)
 ATTR_VROT = DynamicAttribute('vrot',   8)
 ATTR_NAME = DynamicAttribute('name',   9)
+ATTR_WELD = DynamicAttribute('weld',   10)
+ATTR_ADAPT = DynamicAttribute('adapt', 11)
+ATTR_CAP  = DynamicAttribute('cap',    12)
+
+'''
+    Number of new vertices of the coarse preview while hauling.
+'''
+PREVIEW_BUDGET = 20000
+
+'''
+    The seashell modules load NumPy, so they are imported by Load when
+    the first tool is made rather than when Modo loads the kit. The
+    on-disk cache of the sweeps is opened then when SEASHELL_CACHE_DIR
+    is set. The coarse previews are not cached.
+'''
+seashell = seashell_cache = seashell_core = sweep_cache = None
+
+def Load():
+    global seashell, seashell_cache, seashell_core, sweep_cache
+    if seashell_core is None:
+        import seashell
+        import seashell_cache
+        import seashell_core
+        sweep_cache = seashell_cache.Open()
 
 class Seashell_Tool(lxifc.Tool, lxifc.ToolModel, lxu.attributes.DynamicAttributes):
 
     def __init__(self):
         lxu.attributes.DynamicAttributes.__init__(self)
+        Load()
 
         self.dyna_Add(ATTR_AXIS.name, lx.symbol.sTYPE_AXIS)
         self.dyna_Add(ATTR_NREP.name, lx.symbol.sTYPE_INTEGER)
@@ -43,23 +78,33 @@ class Seashell_Tool(lxifc.Tool, lxifc.ToolModel, lxu.attributes.DynamicAttribute
         self.dyna_Add(ATTR_VWRP.name, lx.symbol.sTYPE_FLOAT)
         self.dyna_Add(ATTR_VROT.name, lx.symbol.sTYPE_BOOLEAN)
         self.dyna_Add(ATTR_NAME.name, lx.symbol.sTYPE_STRING)
+        self.dyna_Add(ATTR_WELD.name, lx.symbol.sTYPE_DISTANCE)
+        self.dyna_Add(ATTR_ADAPT.name, lx.symbol.sTYPE_DISTANCE)
+        self.dyna_Add(ATTR_CAP.name, lx.symbol.sTYPE_INTEGER)
     
-        self.attr_SetInt (ATTR_AXIS.index, seashell.Settings.axis)
-        self.attr_SetInt (ATTR_NREP.index, seashell.Settings.nrep)
-        self.attr_SetInt (ATTR_NSID.index, seashell.Settings.nsid)
-        self.attr_SetInt (ATTR_OFF.index, seashell.Settings.off)
-        self.attr_SetFlt (ATTR_SCL.index, seashell.Settings.scl)
-        self.attr_SetInt (ATTR_TXUV.index, seashell.Settings.uvs)
-        self.attr_SetFlt (ATTR_UWRP.index, seashell.Settings.uwrp)
-        self.attr_SetFlt (ATTR_VWRP.index, seashell.Settings.vwrp)
-        self.attr_SetInt (ATTR_VROT.index, seashell.Settings.vrot)
-        self.attr_SetString (ATTR_NAME.index, seashell.Settings.name)
+        defaults = seashell.Settings()
+        self.attr_SetInt (ATTR_AXIS.index, defaults.axis)
+        self.attr_SetInt (ATTR_NREP.index, defaults.nrep)
+        self.attr_SetInt (ATTR_NSID.index, defaults.nsid)
+        self.attr_SetInt (ATTR_OFF.index, defaults.off)
+        self.attr_SetFlt (ATTR_SCL.index, defaults.scl)
+        self.attr_SetInt (ATTR_TXUV.index, defaults.uvs)
+        self.attr_SetFlt (ATTR_UWRP.index, defaults.uwrp)
+        self.attr_SetFlt (ATTR_VWRP.index, defaults.vwrp)
+        self.attr_SetInt (ATTR_VROT.index, defaults.vrot)
+        self.attr_SetString (ATTR_NAME.index, defaults.name)
+        self.attr_SetFlt (ATTR_WELD.index, defaults.weld)
+        self.attr_SetFlt (ATTR_ADAPT.index, defaults.adapt)
+        self.attr_SetInt (ATTR_CAP.index, seashell_core.CAP_STYLES.index(defaults.cap))
+
+        self.hauling = False
 
         pkt_svc = lx.service.Packet()
         self.vec_type = pkt_svc.CreateVectorType(lx.symbol.sCATEGORY_TOOL)
         pkt_svc.AddPacket(self.vec_type, lx.symbol.sP_TOOL_VIEW_EVENT, lx.symbol.fVT_GET)
 
     def tool_Reset (self):
+        self.hauling = False
         self.attr_SetInt (ATTR_AXIS.index, 1)
         self.attr_SetInt (ATTR_NREP.index, 4)
         self.attr_SetInt (ATTR_NSID.index, 20)
@@ -70,18 +115,28 @@ class Seashell_Tool(lxifc.Tool, lxifc.ToolModel, lxu.attributes.DynamicAttribute
         self.attr_SetFlt (ATTR_VWRP.index, 1.0)
         self.attr_SetInt (ATTR_VROT.index, False)
         self.attr_SetString (ATTR_NAME.index, 'Texture')
+        self.attr_SetFlt (ATTR_WELD.index, 0.0)
+        self.attr_SetFlt (ATTR_ADAPT.index, 0.0)
+        self.attr_SetInt (ATTR_CAP.index, 0)
+
+    def GetSettings(self):
+        return seashell.Settings(
+            axis = self.attr_GetInt(ATTR_AXIS.index),
+            nrep = self.attr_GetInt(ATTR_NREP.index),
+            nsid = self.attr_GetInt(ATTR_NSID.index),
+            off = self.attr_GetInt(ATTR_OFF.index),
+            uvs = self.attr_GetInt(ATTR_TXUV.index),
+            uwrp = self.attr_GetFlt(ATTR_UWRP.index),
+            vwrp = self.attr_GetFlt(ATTR_VWRP.index),
+            scl = self.attr_GetFlt(ATTR_SCL.index),
+            vrot = self.attr_GetInt(ATTR_VROT.index),
+            name = self.attr_GetString(ATTR_NAME.index),
+            weld = self.attr_GetFlt(ATTR_WELD.index),
+            adapt = self.attr_GetFlt(ATTR_ADAPT.index),
+            cap = seashell_core.CAP_STYLES[self.attr_GetInt(ATTR_CAP.index)])
 
     def tool_Evaluate(self,vts):
-        seashell.Settings.axis = self.attr_GetInt(ATTR_AXIS.index)
-        seashell.Settings.nrep = self.attr_GetInt(ATTR_NREP.index)
-        seashell.Settings.nsid = self.attr_GetInt(ATTR_NSID.index)
-        seashell.Settings.off = self.attr_GetInt(ATTR_OFF.index)
-        seashell.Settings.scl = self.attr_GetFlt(ATTR_SCL.index)
-        seashell.Settings.uvs = self.attr_GetInt(ATTR_TXUV.index)
-        seashell.Settings.uwrp = self.attr_GetFlt(ATTR_UWRP.index)
-        seashell.Settings.vwrp = self.attr_GetFlt(ATTR_VWRP.index)
-        seashell.Settings.vrot = self.attr_GetInt(ATTR_VROT.index)
-        seashell.Settings.name = self.attr_GetString(ATTR_NAME.index)
+        settings = self.GetSettings()
 
         layer_svc = lx.service.Layer()
         mesh_svc = lx.service.Mesh()
@@ -94,50 +149,67 @@ class Seashell_Tool(lxifc.Tool, lxifc.ToolModel, lxu.attributes.DynamicAttribute
         if layer_scan.test() == False:
             return
 
-        for n in range(layer_scan.Count()):
-            mesh_loc = lx.object.Mesh(layer_scan.MeshEdit(n))
+        call = seashell_telemetry.Begin('seashell.tool')
+        try:
+            layers = []
+            for n in range(layer_scan.Count()):
+                mesh_loc = lx.object.Mesh(layer_scan.MeshEdit(n))
 
-            if mesh_loc.test() == False:
-                continue
+                if mesh_loc.test() == False:
+                    continue
 
-            if mesh_loc.PolygonCount() == 0:
-                continue
+                if mesh_loc.PolygonCount() == 0:
+                    continue
 
-            map = None
-            if seashell.Settings.uvs:
-                vmap_loc = lx.object.MeshMap(mesh_loc.MeshMapAccessor())
-                map = vmap_loc.New(lx.symbol.i_VMAP_TEXTUREUV, seashell.Settings.name)
+                map = None
+                if settings.uvs:
+                    vmap_loc = lx.object.MeshMap(mesh_loc.MeshMapAccessor())
+                    map = vmap_loc.New(lx.symbol.i_VMAP_TEXTUREUV, settings.name)
 
-            polygon_loc = lx.object.Polygon(mesh_loc.PolygonAccessor())
-            point_loc = lx.object.Point(mesh_loc.PointAccessor())
+                polygon_loc = lx.object.Polygon(mesh_loc.PolygonAccessor())
+                point_loc = lx.object.Point(mesh_loc.PointAccessor())
 
-            if polygon_loc.test() == False:
-                continue
+                if polygon_loc.test() == False:
+                    continue
 
-            '''
-                Store the shape in the foreground mesh layer as the
-                profile.
-            '''
-            mark_mode_selected = mesh_svc.ModeCompose (lx.symbol.sMARK_SELECT, None)
-            vis = seashell.PolygonVisitor (polygon_loc, point_loc, map)
-            polygon_loc.Enumerate (mark_mode_selected, vis, 0)
+                '''
+                    Store the shape in the foreground mesh layer as the
+                    profile.
+                '''
+                mark_mode_selected = mesh_svc.ModeCompose (lx.symbol.sMARK_SELECT, None)
+                vis = seashell.PolygonVisitor (polygon_loc, point_loc, map)
+                with seashell_telemetry.Stage('enumerate'):
+                    polygon_loc.Enumerate (mark_mode_selected, vis, 0)
+
+                layers.append((n, vis))
 
             '''
-                Build seashell polygons
+                Build seashell polygons of all layers at once. A build over
+                the budget leaves the layers as they are.
             '''
-            seashell.Build(vis)
+            try:
+                if self.hauling:
+                    seashell.BuildAll([vis for n, vis in layers], settings, budget=PREVIEW_BUDGET)
+                else:
+                    seashell.BuildAll([vis for n, vis in layers], settings, sweep_cache)
+            except seashell_core.BudgetExceeded as error:
+                lx.out("seashell: {}".format(error))
+                return
+
+            for n, vis in layers:
+                '''
+                    We need to tell modo that we have made edits to this mesh.
+                '''
+                layer_scan.SetMeshChange(n, lx.symbol.f_MESHEDIT_GEOMETRY)
 
             '''
-                Before we move on to the next layer, we need to tell modo that we
-                have made edits to this mesh.
+                Finally, we need to call apply on the LayerScan interface. This tells
+                modo to perform all the mesh edits.
             '''
-            layer_scan.SetMeshChange(n, lx.symbol.f_MESHEDIT_GEOMETRY)
-
-        '''
-            Finally, we need to call apply on the LayerScan interface. This tells
-            modo to perform all the mesh edits.
-        '''
-        layer_scan.Apply()
+            with seashell_telemetry.Stage('apply'):
+                layer_scan.Apply()
+        finally:
+            seashell_telemetry.End(call, lx.out)
 
     def tool_VectorType(self):
         '''
@@ -169,7 +241,17 @@ class Seashell_Tool(lxifc.Tool, lxifc.ToolModel, lxu.attributes.DynamicAttribute
         return lx.symbol.fTMOD_I0_ATTRHAUL
 
     def tmod_Initialize(self,vts,adjust,flags):
-    	pass
+        self.hauling = False
+
+    def tmod_Up(self,vts,adjust):
+        '''
+            The haul is over. Set the hauled attribute again to evaluate
+            the tool at full resolution.
+        '''
+        if self.hauling:
+            self.hauling = False
+            adjust_tool = lx.object.AdjustTool(adjust)
+            adjust_tool.SetFlt(ATTR_SCL.index, self.attr_GetFlt(ATTR_SCL.index))
 
     def tmod_Haul(self,index):
         '''
@@ -179,9 +261,11 @@ class Seashell_Tool(lxifc.Tool, lxifc.ToolModel, lxu.attributes.DynamicAttribute
             representing horizontal and 1 representing vertical. The function
             simply returns the name of the attribute to drive, given it's index.
             As we only have one attribute, we'll set horizontal hauling to
-            control it and vertical hauling to do nothing.
+            control it and vertical hauling to do nothing. While hauling,
+            the tool only builds a coarse preview.
         '''
         if index == 0:
+            self.hauling = True
             return ATTR_SCL.name
         else:
             return 0
@@ -228,6 +312,12 @@ class Seashell_Tool(lxifc.Tool, lxifc.ToolModel, lxu.attributes.DynamicAttribute
     def arg_UIHints(self, index, hints):
         if index == ATTR_NREP.index or index == ATTR_NSID.index or index == ATTR_OFF.index:
             hints.MinInt(1)
+        elif index == ATTR_WELD.index or index == ATTR_ADAPT.index:
+            hints.MinFloat(0.0)
+
+    def arg_UIValueHints(self, index):
+        if index == ATTR_CAP.index:
+            return seashell.CapHints()
 
     def arg_DisableMsg(self,index,msg):
         if index == ATTR_UWRP.index or index == ATTR_VWRP.index or index == ATTR_VROT.index or index == ATTR_NAME.index:
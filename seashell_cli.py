@@ -0,0 +1,370 @@
+'''
+    Command line tool to make seashell meshes without Modo or Blender.
+
+    The profile polygons are read from an OBJ file, where every face is a
+    profile, or from a JSON file holding a list of profiles, each a list
+    of [x, y, z] positions (or an object with such a list as "profiles").
+    The sweeps are made by the same kernel as the plug-ins and streamed
+    slice by slice into a binary PLY or an OBJ file, so even very large
+    shells are written with little memory.
+
+    With --vary or --grid, a shell is made for every combination of the
+    given parameter values. The shells are made in a process pool and the
+    output path is formatted with the parameters of each shell, such as
+    "shells/shell_{nsid}_{scl}.ply", or numbered when it has no fields.
+
+    Every shell is checked against a budget of new points before it is
+    made, which refuses it, warns, or reduces the sides per loop to fit.
+    The defaults are taken from SEASHELL_BUDGET and
+    SEASHELL_BUDGET_POLICY.
+
+    Examples:
+        python seashell_cli.py profile.obj -o shell.ply --sides 40 --nrep 6
+        python seashell_cli.py profile.json -o shells/shell.ply --vary nsid=20,40 --vary scl=0.5,0.6,0.7 --jobs 8
+'''
+
+import argparse
+import itertools
+import json
+import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy
+
+try:
+    import seashell_core
+except ImportError:
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "lib"))
+    import seashell_core
+
+
+'''
+    Read the profile polygons of an OBJ or a JSON file as a list of
+    (nvert, 3) arrays.
+'''
+def ReadProfiles(path):
+    if os.path.splitext(path)[1].lower() == '.json':
+        return ReadJSON(path)
+    return ReadOBJ(path)
+
+def ReadOBJ(path):
+    positions = []
+    faces = []
+    with open(path) as f:
+        for line in f:
+            fields = line.split()
+            if not fields:
+                continue
+            if fields[0] == 'v':
+                positions.append([float(x) for x in fields[1:4]])
+            elif fields[0] == 'f':
+                face = []
+                for field in fields[1:]:
+                    index = int(field.split('/')[0])
+                    face.append(index - 1 if index > 0 else len(positions) + index)
+                faces.append(face)
+    positions = numpy.array(positions, dtype=numpy.float64).reshape(-1, 3)
+    return [positions[face] for face in faces]
+
+def ReadJSON(path):
+    with open(path) as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data['profiles']
+    return [numpy.array(profile, dtype=numpy.float64).reshape(-1, 3) for profile in data]
+
+
+'''
+    Binary little endian PLY writer. PLY needs all vertices before the
+    faces, so the faces are spooled into a temporary file and appended
+    when the file is closed, and the element counts in the header are
+    filled in at the end. The corner texture coordinates are written as
+    the "texcoord" list of the faces. The list counts are ints, as the
+    n-gon caps of large profiles have more corners than a uchar holds.
+'''
+class PLYWriter(object):
+    def __init__(self, path, uvs):
+        self.uvs = uvs
+        self.npoints = 0
+        self.nfaces = 0
+        self.file = open(path, 'wb')
+        self.faces = tempfile.TemporaryFile()
+
+        header = ["ply", "format binary_little_endian 1.0", "comment made by seashell_cli",
+                  "element vertex {:>12}".format(0),
+                  "property float x", "property float y", "property float z",
+                  "element face {:>12}".format(0),
+                  "property list int int vertex_indices"]
+        if uvs:
+            header.append("property list int float texcoord")
+        header.append("end_header")
+        self.header = ('\n'.join(header) + '\n').encode('ascii')
+        self.file.write(self.header)
+
+    def Points(self, positions):
+        self.file.write(positions.astype('<f4').tobytes())
+        self.npoints += len(positions)
+
+    def Faces(self, indices, uvs):
+        size = indices.shape[1]
+        fields = [('n', '<i4'), ('v', '<i4', (size,))]
+        if self.uvs:
+            fields += [('m', '<i4'), ('t', '<f4', (2 * size,))]
+        records = numpy.empty(len(indices), dtype=fields)
+        records['n'] = size
+        records['v'] = indices
+        if self.uvs:
+            records['m'] = 2 * size
+            records['t'] = uvs.reshape(len(indices), -1)
+        self.faces.write(records.tobytes())
+        self.nfaces += len(indices)
+
+    def Close(self):
+        self.faces.seek(0)
+        shutil.copyfileobj(self.faces, self.file)
+        self.faces.close()
+
+        header = self.header.decode('ascii')
+        header = header.replace("element vertex {:>12}".format(0), "element vertex {:>12}".format(self.npoints))
+        header = header.replace("element face {:>12}".format(0), "element face {:>12}".format(self.nfaces))
+        self.file.seek(0)
+        self.file.write(header.encode('ascii'))
+        self.file.close()
+
+
+'''
+    Wavefront OBJ writer. The texture coordinates of the corners of each
+    chunk are written once per distinct value.
+'''
+class OBJWriter(object):
+    def __init__(self, path, uvs):
+        self.uvs = uvs
+        self.npoints = 0
+        self.nfaces = 0
+        self.ncoords = 0
+        self.file = open(path, 'w')
+        self.file.write("# made by seashell_cli\n")
+
+    def Points(self, positions):
+        numpy.savetxt(self.file, positions, fmt='v %.6f %.6f %.6f')
+        self.npoints += len(positions)
+
+    def Faces(self, indices, uvs):
+        size = indices.shape[1]
+        if self.uvs:
+            coords, inverse = numpy.unique(uvs.reshape(-1, 2), axis=0, return_inverse=True)
+            numpy.savetxt(self.file, coords, fmt='vt %.6f %.6f')
+            corners = numpy.stack((indices + 1, inverse.reshape(indices.shape) + self.ncoords + 1), axis=-1)
+            numpy.savetxt(self.file, corners.reshape(len(indices), -1), fmt='f' + ' %d/%d' * size)
+            self.ncoords += len(coords)
+        else:
+            numpy.savetxt(self.file, indices + 1, fmt='f' + ' %d' * size)
+        self.nfaces += len(indices)
+
+    def Close(self):
+        self.file.close()
+
+
+WRITERS = {'.ply': PLYWriter, '.obj': OBJWriter}
+
+
+'''
+    Sweep the profiles and stream the result into the file. The profile
+    points are written first as ring 0 of each sweep, and with caps the
+    profile polygon is written as the start cap. Returns the number of
+    points and faces written. The file is removed when the shell fails.
+'''
+def WriteShell(path, profiles, settings, chunk=8):
+    writer = WRITERS[os.path.splitext(path)[1].lower()](path, settings.uvs)
+    try:
+        for profile in profiles:
+            base = writer.npoints
+            writer.Points(profile)
+            if settings.cap != 'none':
+                for indices, uvs in seashell_core.ProfileCap(len(profile), settings.uvs):
+                    writer.Faces(indices + base, uvs)
+            for sweep in seashell_core.IterSweep(profile, settings, chunk):
+                writer.Points(sweep.positions)
+                for indices, uvs in seashell_core.SweepFaces(sweep):
+                    if len(indices):
+                        writer.Faces(indices + base, uvs)
+    except BaseException:
+        writer.Close()
+        os.remove(path)
+        raise
+    writer.Close()
+    return writer.npoints, writer.nfaces
+
+
+'''
+    Parse a count which must be at least 1, such as the sides per loop.
+'''
+def PositiveInt(text):
+    try:
+        value = int(text)
+    except ValueError:
+        value = 0
+    if value < 1:
+        raise argparse.ArgumentTypeError("{} is not a positive integer".format(text))
+    return value
+
+'''
+    Settings which are counts of at least 1.
+'''
+POSITIVE_SETTINGS = ('nrep', 'nsid')
+
+'''
+    Parse the value of a setting to the type of its default. Raises
+    ValueError for a value the setting cannot take.
+'''
+def ParseValue(name, text):
+    default = getattr(seashell_core.Settings(), name)
+    if name == 'axis':
+        if text.upper() in ('X', 'Y', 'Z'):
+            return 'XYZ'.index(text.upper())
+        if text not in ('0', '1', '2'):
+            raise ValueError("axis must be X, Y or Z, not {}".format(text))
+        return int(text)
+    if name == 'cap' and text not in seashell_core.CAP_STYLES:
+        raise ValueError("cap must be one of {}, not {}".format(', '.join(seashell_core.CAP_STYLES), text))
+    if name in POSITIVE_SETTINGS:
+        try:
+            return PositiveInt(text)
+        except argparse.ArgumentTypeError as error:
+            raise ValueError("{} {}".format(name, error))
+    if isinstance(default, bool):
+        return text.lower() in ('1', 'true', 'yes', 'on')
+    return type(default)(text)
+
+'''
+    Make the settings of every combination of the varied values.
+'''
+def Grid(settings, vary):
+    names = list(vary)
+    return [settings._replace(**dict(zip(names, values)))
+            for values in itertools.product(*[vary[name] for name in names])]
+
+'''
+    Format the output path of the index-th shell of a grid.
+'''
+def OutputPath(output, index, settings):
+    if '{' not in output:
+        root, ext = os.path.splitext(output)
+        output = root + '_{index:04d}' + ext
+    return output.format(index=index, **settings._asdict())
+
+'''
+    Check the shell against the budget. Returns the settings to make it
+    with, clamped by the budget, and the message of the budget or None.
+    Raises seashell_core.BudgetExceeded when the shell is refused.
+'''
+def Budgeted(profiles, settings, budget):
+    clamped, cost, message = seashell_core.ApplyBudget([(profile, settings) for profile in profiles], budget)
+    return (clamped[0] if clamped else settings), message
+
+'''
+    Make one shell of a grid. Returns the path, the numbers of points and
+    faces written, or None when the shell was refused, and the message of
+    the budget.
+'''
+def Job(job):
+    path, profiles, settings, chunk, budget = job
+    try:
+        settings, message = Budgeted(profiles, settings, budget)
+    except seashell_core.BudgetExceeded as error:
+        return path, None, str(error)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return path, WriteShell(path, profiles, settings, chunk), message
+
+'''
+    Print the result of a Job. Returns False when the shell was refused.
+'''
+def Report(path, counts, message):
+    if message:
+        print("{}: {}".format(path, message), file=sys.stderr)
+    if counts is None:
+        return False
+    print("{}: {} points {} faces".format(path, *counts))
+    return True
+
+
+def main(argv=None):
+    defaults = seashell_core.Settings()
+    parser = argparse.ArgumentParser(description="Make seashell meshes from profile polygons.")
+    parser.add_argument('input', help="OBJ or JSON file of the profile polygons")
+    parser.add_argument('-o', '--output', required=True, help="PLY or OBJ file to write")
+    parser.add_argument('--axis', default='XYZ'[defaults.axis], choices=['X', 'Y', 'Z'], help="sweep axis")
+    parser.add_argument('--nrep', type=PositiveInt, default=defaults.nrep, help="number of loops")
+    parser.add_argument('--sides', type=PositiveInt, default=defaults.nsid, help="sides per loop")
+    parser.add_argument('--offset', type=float, default=defaults.off, help="shift per loop")
+    parser.add_argument('--scale', type=float, default=defaults.scl, help="scale per loop")
+    parser.add_argument('--no-uvs', action='store_true', help="do not write texture coordinates")
+    parser.add_argument('--uwrap', type=float, default=defaults.uwrp, help="U wrap amount")
+    parser.add_argument('--vwrap', type=float, default=defaults.vwrp, help="V wrap amount")
+    parser.add_argument('--weld', type=float, default=defaults.weld, help="weld tolerance of the apex")
+    parser.add_argument('--adapt', type=float, default=defaults.adapt, help="chord tolerance of adaptive slices")
+    parser.add_argument('--cap', default=defaults.cap, choices=seashell_core.CAP_STYLES, help="style of the caps")
+    parser.add_argument('--chunk', type=PositiveInt, default=8, help="slices streamed at a time")
+    budget = seashell_core.EnvironmentBudget()
+    parser.add_argument('--budget', type=int, default=budget.points, help="largest number of new points of a shell, 0 for no limit")
+    parser.add_argument('--budget-policy', default=budget.policy, choices=seashell_core.BUDGET_POLICIES,
+                        help="what to do with a shell over the budget")
+    parser.add_argument('--vary', action='append', default=[], metavar='NAME=V1,V2,...',
+                        help="make a shell for every value of the setting")
+    parser.add_argument('--grid', help="JSON file of lists of values per setting to vary")
+    parser.add_argument('--jobs', type=PositiveInt, default=os.cpu_count(), help="processes of a grid")
+    args = parser.parse_args(argv)
+
+    settings = defaults._replace(
+        axis = 'XYZ'.index(args.axis),
+        nrep = args.nrep,
+        nsid = args.sides,
+        off = args.offset,
+        uvs = not args.no_uvs,
+        uwrp = args.uwrap,
+        vwrp = args.vwrap,
+        scl = args.scale,
+        weld = args.weld,
+        adapt = args.adapt,
+        cap = args.cap)
+    if os.path.splitext(args.output)[1].lower() not in WRITERS:
+        parser.error("the output must be a .ply or .obj file")
+
+    vary = {}
+    if args.grid:
+        with open(args.grid) as f:
+            for name, values in json.load(f).items():
+                if name not in settings._fields:
+                    parser.error("unknown setting {}".format(name))
+                vary[name] = [str(value) for value in values]
+    for item in args.vary:
+        name, values = item.split('=', 1)
+        if name not in settings._fields:
+            parser.error("unknown setting {}".format(name))
+        vary[name] = values.split(',')
+    try:
+        vary = {name: [ParseValue(name, value) for value in values] for name, values in vary.items()}
+    except ValueError as error:
+        parser.error(str(error))
+
+    profiles = ReadProfiles(args.input)
+    budget = seashell_core.Budget(args.budget, args.budget_policy)
+    if not vary:
+        if not Report(*Job((args.output, profiles, settings, args.chunk, budget))):
+            sys.exit(1)
+        return
+
+    jobs = [(OutputPath(args.output, index, job), profiles, job, args.chunk, budget)
+            for index, job in enumerate(Grid(settings, vary))]
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        built = [Report(*result) for result in executor.map(Job, jobs)]
+    if not all(built):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
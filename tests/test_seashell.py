@@ -0,0 +1,88 @@
+'''
+    Tests of writing the sweeps into a Modo mesh, run on the in-memory
+    stand-ins of the Modo API in benchmarks/hosts.py.
+'''
+
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "lib"), os.path.join(ROOT, "benchmarks")]
+
+import hosts
+hosts.InstallModo()
+
+import numpy as np
+import seashell
+import seashell_core
+
+from test_seashell_core import CircleProfile
+
+
+'''
+    Polygons of a mesh after its profiles, each as a tuple of its points
+    and the UVs of its corners, the polygon value of a corner when it is
+    set and the point value otherwise.
+'''
+def MeshPolygons(mesh, nprofiles):
+    polygons = []
+    for polygonID in range(nprofiles, len(mesh.polygons)):
+        points = mesh.polygons[polygonID]
+        uvs = [mesh.polygon_map.get((polygonID, point), mesh.point_map.get(point)) for point in points]
+        polygons.append((tuple(points), tuple(tuple(np.round(uv, 6)) for uv in uvs)))
+    return sorted(polygons)
+
+'''
+    Polygons of the sweeps of the profiles written into a mesh holding
+    the profiles only, in the form of MeshPolygons. The profile points
+    come first and the new points of every sweep follow in order.
+'''
+def SweepPolygons(profiles, sweeps):
+    polygons = []
+    start = sum(len(profile) for profile in profiles)
+    base = 0
+    for profile, sweep in zip(profiles, sweeps):
+        nvert = len(profile)
+        table = np.concatenate((np.arange(base, base + nvert), np.arange(start, start + len(sweep.positions))))
+        for indices, uvs in seashell_core.SweepFaces(sweep):
+            for points, corners in zip(table[indices].tolist(), uvs.tolist()):
+                polygons.append((tuple(points), tuple(tuple(np.round(uv, 6)) for uv in corners)))
+        base += nvert
+        start += len(sweep.positions)
+    return sorted(polygons)
+
+
+class WriteTest(unittest.TestCase):
+    def Check(self, profiles, settings):
+        mesh = hosts.Mesh()
+        for profile in profiles:
+            mesh.AddProfile(profile)
+        vis = seashell.PolygonVisitor(hosts.Polygon(mesh), hosts.Point(mesh), 'Texture')
+        vis.polygon.Enumerate(None, vis, 0)
+        seashell.BuildAll([vis], settings)
+
+        sweeps = [seashell_core.BuildSweep(profile, settings) for profile in profiles]
+        nprofile = sum(len(profile) for profile in profiles)
+        positions = np.concatenate([sweep.positions for sweep in sweeps])
+        self.assertTrue(np.allclose(np.array(mesh.points[nprofile:]), positions))
+        self.assertEqual(MeshPolygons(mesh, len(profiles)), SweepPolygons(profiles, sweeps))
+
+    def testWrite(self):
+        profiles = [CircleProfile(8), CircleProfile(6, center=3.0)]
+        for weld in (0.0, 0.05):
+            for cap in seashell_core.CAP_STYLES:
+                settings = seashell_core.Settings(nsid=12, nrep=6, scl=0.2, weld=weld, cap=cap)
+                self.Check(profiles, settings)
+
+    def testWriteStream(self):
+        stream_min_size = seashell_core.STREAM_MIN_SIZE
+        seashell_core.STREAM_MIN_SIZE = 1
+        try:
+            self.testWrite()
+        finally:
+            seashell_core.STREAM_MIN_SIZE = stream_min_size
+
+
+if __name__ == "__main__":
+    unittest.main()
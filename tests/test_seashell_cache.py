@@ -0,0 +1,84 @@
+'''
+    Tests of the on-disk sweep cache.
+'''
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lib"))
+
+import numpy as np
+import seashell_cache
+import seashell_core
+
+from test_seashell_core import CircleProfile
+
+
+class DiskCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.settings = seashell_core.Settings(nsid=12, nrep=3)
+        self.profile = CircleProfile(8)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def testRoundTrip(self):
+        sweep = seashell_cache.DiskCache(self.directory).BuildSweep(self.profile, self.settings)
+        loaded = seashell_cache.DiskCache(self.directory).BuildSweep(self.profile, self.settings)
+        self.assertTrue(np.array_equal(loaded.positions, sweep.positions))
+        self.assertTrue(np.array_equal(loaded.quads, sweep.quads))
+        self.assertTrue(np.array_equal(loaded.uvs, sweep.uvs))
+
+    def testMemoryFirst(self):
+        cache = seashell_cache.DiskCache(self.directory, cache=seashell_core.SweepCache())
+        sweep = cache.BuildSweep(self.profile, self.settings)
+        load = cache.Load
+        cache.Load = lambda path: self.fail("read the disk for a sweep in memory")
+        try:
+            self.assertIs(cache.BuildSweep(self.profile, self.settings), sweep)
+        finally:
+            cache.Load = load
+
+    def testEvict(self):
+        cache = seashell_cache.DiskCache(self.directory, maxbytes=1, maxsize=1)
+        for nsid in (8, 10, 12):
+            cache.BuildSweep(self.profile, self.settings._replace(nsid=nsid))
+        self.assertLessEqual(len(os.listdir(self.directory)), 1)
+
+    def testEvictKeepsSweepsInMemory(self):
+        cache = seashell_cache.DiskCache(self.directory, maxbytes=1)
+        for nsid in (8, 10, 12):
+            cache.BuildSweep(self.profile, self.settings._replace(nsid=nsid))
+        self.assertEqual(sorted(os.listdir(self.directory)), sorted(cache.sweeps))
+
+    def testEvictFailure(self):
+        cache = seashell_cache.DiskCache(self.directory, maxbytes=1, maxsize=1)
+        rmtree = seashell_cache.shutil.rmtree
+        seashell_cache.shutil.rmtree = lambda path, ignore_errors=False: None
+        try:
+            for nsid in (8, 10, 12):
+                cache.BuildSweep(self.profile, self.settings._replace(nsid=nsid))
+        finally:
+            seashell_cache.shutil.rmtree = rmtree
+        size = sum(f.stat().st_size for entry in os.scandir(self.directory) for f in os.scandir(entry.path))
+        self.assertEqual(cache.total, size)
+
+    def testUnwritable(self):
+        mkdtemp = tempfile.mkdtemp
+        def Fail(*args, **kwargs):
+            raise OSError("read-only")
+        tempfile.mkdtemp = Fail
+        try:
+            sweep = seashell_cache.DiskCache(self.directory).BuildSweep(self.profile, self.settings)
+        finally:
+            tempfile.mkdtemp = mkdtemp
+        self.assertEqual(len(sweep.positions), seashell_core.SweepCost(self.profile, self.settings).points)
+        self.assertEqual(os.listdir(self.directory), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
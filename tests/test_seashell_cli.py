@@ -0,0 +1,62 @@
+'''
+    Tests of the parsing and the writing of the command line tool.
+'''
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lib"))
+sys.path.insert(0, ROOT)
+
+import seashell_cli
+import seashell_core
+
+from test_seashell_core import CircleProfile
+
+
+class ParseTest(unittest.TestCase):
+    def testValues(self):
+        self.assertEqual(seashell_cli.ParseValue('axis', 'z'), 2)
+        self.assertEqual(seashell_cli.ParseValue('axis', '0'), 0)
+        self.assertEqual(seashell_cli.ParseValue('nsid', '12'), 12)
+        self.assertEqual(seashell_cli.ParseValue('cap', 'fan'), 'fan')
+        self.assertEqual(seashell_cli.ParseValue('scl', '0.5'), 0.5)
+        self.assertIs(seashell_cli.ParseValue('uvs', 'no'), False)
+
+    def testInvalid(self):
+        for name, text in (('nsid', '0'), ('nrep', '-1'), ('nsid', 'x'), ('cap', 'ngo'), ('axis', 'XY'), ('axis', '7')):
+            with self.assertRaises(ValueError, msg=(name, text)):
+                seashell_cli.ParseValue(name, text)
+
+    def testArguments(self):
+        for argument in ('--sides=0', '--nrep=0', '--chunk=0', '--axis=XY', '--axis=', '--vary=nsid=0', '--vary=cap=ngo'):
+            with self.assertRaises(SystemExit, msg=argument):
+                seashell_cli.main(['profile.obj', '-o', 'shell.ply', argument])
+
+
+class WriteTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def testCounts(self):
+        path = os.path.join(self.directory, 'shell.ply')
+        settings = seashell_core.Settings(nsid=10, nrep=2, cap='ngon')
+        points, faces = seashell_cli.WriteShell(path, [CircleProfile(8)], settings)
+        self.assertEqual((points, faces), (8 + 8 * 20, 8 * 20 + 2))
+
+    def testFailureRemovesFile(self):
+        path = os.path.join(self.directory, 'shell.ply')
+        with self.assertRaises(ValueError):
+            seashell_cli.WriteShell(path, [CircleProfile(8)], seashell_core.Settings(cap='ngo'))
+        self.assertFalse(os.path.exists(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
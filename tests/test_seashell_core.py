@@ -0,0 +1,319 @@
+'''
+    Tests of the seashell kernel. They need NumPy only and run with
+    "python -m pytest tests" or "python -m unittest discover tests".
+'''
+
+import math
+import os
+import sys
+import unittest
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lib"))
+
+import numpy as np
+import seashell_core
+
+
+'''
+    Make a circle profile of nvert vertices beside the Y axis.
+'''
+def CircleProfile(nvert, radius=0.5, center=1.5):
+    return np.array([(center + radius * math.cos(2.0 * math.pi * k / nvert),
+                      radius * math.sin(2.0 * math.pi * k / nvert),
+                      0.0) for k in range(nvert)])
+
+'''
+    Count the edges of the polygons which are used by a single polygon.
+    With the profile as the start cap, a closed shell has none.
+'''
+def OpenEdges(nvert, sweep, start_cap=True):
+    polygons = [polygon for indices, uvs in seashell_core.SweepFaces(sweep) for polygon in indices.tolist()]
+    if start_cap:
+        polygons.append(list(range(nvert)))
+    edges = Counter()
+    for polygon in polygons:
+        for a, b in zip(polygon, polygon[1:] + polygon[:1]):
+            if a != b:
+                edges[min(a, b), max(a, b)] += 1
+    return sum(1 for count in edges.values() if count == 1)
+
+'''
+    Sweep the profile vertex by vertex like the original Blender operator
+    did. Returns the new positions, the quads and the UVs of their
+    corners in the layout of a Sweep.
+'''
+def ReferenceSweep(profile, settings):
+    scl = max(settings.scl, 1.0e-6)
+    n = settings.nsid * settings.nrep
+    rot = math.pi / settings.nsid
+    cen = settings.off / scl
+    step = math.pow(scl, 1.0 / settings.nsid)
+    usiz = n * settings.uwrp
+    nvert = len(profile)
+
+    positions, quads, uvs = [], [], []
+    sc, rt = 1.0, 0.0
+    for i in range(n):
+        sc *= step
+        rt += rot
+        c, s = math.cos(rt), math.sin(rt)
+        for x, y, z in profile:
+            if settings.axis == 0:
+                positions.append(((x - cen) * sc + cen, x * sc * c - z * sc * s, y * sc * s + z * sc * c))
+            elif settings.axis == 1:
+                positions.append((x * sc * c - z * sc * s, (y - cen) * sc + cen, x * sc * s + z * sc * c))
+            else:
+                positions.append((x * sc * c - y * sc * s, x * sc * s + y * sc * c, (z - cen) * sc + cen))
+        front = i * nvert
+        back = (i + 1) * nvert
+        for k in range(nvert):
+            l = (k + 1) % nvert
+            quads.append((front + l, front + k, back + k, back + l))
+            uvs.append(((1.0 - i / n) * usiz, 1.0 - (k + 1) / nvert * settings.vwrp))
+            uvs.append(((1.0 - i / n) * usiz, 1.0 - k / nvert * settings.vwrp))
+            uvs.append(((1.0 - (i + 1) / n) * usiz, 1.0 - k / nvert * settings.vwrp))
+            uvs.append(((1.0 - (i + 1) / n) * usiz, 1.0 - (k + 1) / nvert * settings.vwrp))
+    return np.array(positions), np.array(quads), np.array(uvs).reshape(-1, 4, 2)
+
+'''
+    Polygons of a sweep as sorted tuples of point indices.
+'''
+def PolygonSet(sweep):
+    return sorted(tuple(polygon) for indices, uvs in seashell_core.SweepFaces(sweep) for polygon in indices.tolist())
+
+
+class SweepTest(unittest.TestCase):
+    def testMatchesReference(self):
+        profile = CircleProfile(7) + (0.0, 0.2, 0.1)
+        for axis in (0, 1, 2):
+            for scl in (0.6, 1.0, 0.0):
+                settings = seashell_core.Settings(axis=axis, nsid=6, nrep=3, scl=scl, off=0.7, uwrp=0.3, vwrp=0.8)
+                positions, quads, uvs = ReferenceSweep(profile, settings)
+                sweep = seashell_core.BuildSweep(profile, settings)
+                self.assertTrue(np.allclose(sweep.positions, positions), (axis, scl))
+                self.assertTrue(np.array_equal(sweep.quads, quads), (axis, scl))
+                self.assertTrue(np.allclose(sweep.uvs, uvs), (axis, scl))
+                self.assertEqual(sweep.polygons, ())
+
+    def testNoUVs(self):
+        sweep = seashell_core.BuildSweep(CircleProfile(5), seashell_core.Settings(uvs=False))
+        self.assertIsNone(sweep.uvs)
+
+
+class CapTest(unittest.TestCase):
+    def testClosed(self):
+        for cap in seashell_core.CAP_STYLES:
+            settings = seashell_core.Settings(nsid=12, nrep=2, cap=cap)
+            sweep = seashell_core.BuildSweep(CircleProfile(8), settings)
+            self.assertEqual(OpenEdges(8, sweep), 8 if cap == 'none' else 0, cap)
+            for indices, uvs in sweep.polygons:
+                self.assertTrue((indices < 8 + len(sweep.positions)).all(), cap)
+                self.assertEqual(uvs.shape, indices.shape + (2,), cap)
+
+
+class WeldTest(unittest.TestCase):
+    def testWatertight(self):
+        for nvert in (8, 32):
+            for weld in (0.01, 0.05, 0.3):
+                settings = seashell_core.Settings(nsid=20, nrep=8, scl=0.2, weld=weld)
+                sweep = seashell_core.BuildSweep(CircleProfile(nvert), settings)
+                self.assertEqual(OpenEdges(nvert, sweep), 0, (nvert, weld))
+
+    def testOpenEnd(self):
+        settings = seashell_core.Settings(nsid=20, nrep=2, scl=0.6, weld=0.05)
+        sweep = seashell_core.BuildSweep(CircleProfile(8), settings)
+        self.assertEqual(OpenEdges(8, sweep), 8)
+
+
+class StreamTest(unittest.TestCase):
+    def testChunksJoinToSweep(self):
+        for weld in (0.0, 0.01, 0.05, 0.3):
+            for cap in seashell_core.CAP_STYLES:
+                settings = seashell_core.Settings(nsid=20, nrep=8, scl=0.2, weld=weld, cap=cap)
+                profile = CircleProfile(8)
+                sweep = seashell_core.BuildSweep(profile, settings)
+                polygons = sorted(tuple(polygon) for indices, uvs in seashell_core.SweepFaces(sweep)
+                                  for polygon in indices.tolist())
+                for chunk in (1, 7, 1000):
+                    chunks = list(seashell_core.IterSweep(profile, settings, chunk))
+                    positions = np.concatenate([part.positions for part in chunks])
+                    joined = sorted(tuple(polygon) for part in chunks
+                                    for indices, uvs in seashell_core.SweepFaces(part)
+                                    for polygon in indices.tolist())
+                    self.assertTrue(np.allclose(positions, sweep.positions), (weld, cap, chunk))
+                    self.assertEqual(joined, polygons, (weld, cap, chunk))
+
+
+class SharedUVsTest(unittest.TestCase):
+    def testCornersKeepTheirUVs(self):
+        for cap in ('none', 'fan'):
+            settings = seashell_core.Settings(nsid=10, nrep=2, cap=cap)
+            sweep = seashell_core.BuildSweep(CircleProfile(6), settings)
+            values, corners = seashell_core.SharedUVs(6, sweep)
+            self.assertEqual(len(values), len(sweep.positions))
+
+            faces = [face for face in seashell_core.SweepFaces(sweep) if len(face[0])]
+            indices = np.concatenate([face[0].ravel() for face in faces])
+            uvs = np.concatenate([face[1].reshape(-1, 2) for face in faces])
+            split = {}
+            for polygon, points in corners:
+                for point, uv in points:
+                    split.setdefault(point, []).append(uv)
+            for point, uv in zip(indices.tolist(), uvs.tolist()):
+                if point >= 6 and np.allclose(values[point - 6], uv):
+                    continue
+                self.assertTrue(any(np.allclose(uv, value) for value in split.get(point, ())), (cap, point))
+
+
+class CacheTest(unittest.TestCase):
+    def testSameAsBuild(self):
+        cache = seashell_core.SweepCache()
+        profile = CircleProfile(8)
+        for weld in (0.0, 0.05):
+            for cap in seashell_core.CAP_STYLES:
+                for uwrp in (0.2, 0.5):
+                    settings = seashell_core.Settings(nsid=12, nrep=6, scl=0.2, weld=weld, cap=cap, uwrp=uwrp)
+                    sweep = seashell_core.BuildSweep(profile, settings)
+                    for attempt in range(2):
+                        cached = cache.BuildSweep(profile, settings)
+                        self.assertTrue(np.allclose(cached.positions, sweep.positions))
+                        self.assertTrue(np.allclose(cached.uvs, sweep.uvs))
+                        self.assertEqual(PolygonSet(cached), PolygonSet(sweep))
+
+    def testReuse(self):
+        cache = seashell_core.SweepCache()
+        profile = CircleProfile(8)
+        first = cache.BuildSweep(profile, seashell_core.Settings(uwrp=0.2))
+        second = cache.BuildSweep(profile, seashell_core.Settings(uwrp=0.4))
+        self.assertIs(first.positions, second.positions)
+        self.assertFalse(np.allclose(first.uvs, second.uvs))
+
+
+class BuildSweepsTest(unittest.TestCase):
+    def testRotatedCopies(self):
+        settings = seashell_core.Settings(nsid=10, nrep=3)
+        profile = CircleProfile(6) + (0.0, 0.3, 0.0)
+        rotation = seashell_core.AxisRotation(0, 2, 0.7)
+        copies = [profile, profile.copy(), np.matmul(profile, rotation.T)]
+        sweeps = seashell_core.BuildSweeps([(copy, settings) for copy in copies])
+        for copy, sweep in zip(copies, sweeps):
+            alone = seashell_core.BuildSweep(copy, settings)
+            self.assertTrue(np.allclose(sweep.positions, alone.positions))
+            self.assertTrue(np.array_equal(sweep.quads, alone.quads))
+
+    def testOtherSettings(self):
+        profile = CircleProfile(6)
+        jobs = [(profile, seashell_core.Settings(nsid=10)), (profile, seashell_core.Settings(nsid=12))]
+        sweeps = seashell_core.BuildSweeps(jobs)
+        self.assertEqual([len(sweep.positions) for sweep in sweeps], [6 * 10 * 4, 6 * 12 * 4])
+
+
+class LODTest(unittest.TestCase):
+    def testLevels(self):
+        profile = CircleProfile(12)
+        settings = seashell_core.Settings(nsid=10, nrep=3, cap='ngon')
+        lods = seashell_core.BuildLODs(profile, settings)
+        self.assertEqual(len(lods), len(seashell_core.LOD_CHAIN))
+
+        full = seashell_core.BuildSweep(profile, settings)
+        self.assertTrue(np.allclose(lods[0][1].positions, full.positions))
+        self.assertEqual(PolygonSet(lods[0][1]), PolygonSet(full))
+
+        last = full.positions[-12:]
+        for (lod_profile, sweep), lod in zip(lods, seashell_core.LOD_CHAIN):
+            nv = len(lod_profile)
+            self.assertEqual(nv, 12 // lod.stride)
+            self.assertTrue(np.allclose(sweep.positions[-nv:], last[::lod.stride]))
+            self.assertEqual(OpenEdges(nv, sweep), 0)
+
+
+class CheckTest(unittest.TestCase):
+    def testDegenerate(self):
+        settings = seashell_core.Settings()
+        self.assertEqual(seashell_core.CheckProfile([(1, 0, 0), (2, 0, 0), (1, 0, 0)], settings).degenerate, 1)
+        self.assertEqual(seashell_core.CheckProfile(CircleProfile(5), settings), seashell_core.Problems())
+
+    def testRepeated(self):
+        profile = np.concatenate((CircleProfile(5), CircleProfile(5)[-1:]))
+        self.assertEqual(seashell_core.CheckProfile(profile, seashell_core.Settings()).repeated, 1)
+
+    def testZeroRings(self):
+        settings = seashell_core.Settings(nsid=10, nrep=8, scl=0.01)
+        self.assertGreater(seashell_core.CheckProfile(CircleProfile(5), settings).zero, 0)
+        self.assertEqual(seashell_core.CheckProfile(CircleProfile(5), settings._replace(weld=0.01)).zero, 0)
+
+    def testValidFaces(self):
+        sweep = seashell_core.BuildSweep(CircleProfile(5), seashell_core.Settings(nsid=4, nrep=1))
+        self.assertIs(seashell_core.ValidFaces(sweep)[0], sweep)
+
+        quads = np.concatenate((sweep.quads, sweep.quads[:1], [[0, 0, 5, 6]]))
+        uvs = np.concatenate((sweep.uvs, sweep.uvs[:2]))
+        valid, skipped = seashell_core.ValidFaces(sweep._replace(quads=quads, uvs=uvs))
+        self.assertEqual(skipped, 2)
+        self.assertTrue(np.array_equal(valid.quads, sweep.quads))
+        self.assertTrue(np.array_equal(valid.uvs, sweep.uvs))
+
+
+class ProgressTest(unittest.TestCase):
+    def testBuildCounts(self):
+        profile = CircleProfile(8)
+        settings = seashell_core.Settings(nsid=30, nrep=4)
+        progress = seashell_core.Progress()
+        seashell_core.BuildSweep(profile, settings, progress)
+        self.assertEqual(progress.Take(), seashell_core.SweepSize(profile, settings))
+        self.assertEqual(progress.Take(), 0)
+        progress.Cancel()
+        with self.assertRaises(seashell_core.Cancelled):
+            seashell_core.BuildSweep(profile, settings, progress)
+
+
+
+class PreviewTest(unittest.TestCase):
+    def testWithinBudget(self):
+        settings = seashell_core.Settings(nsid=40, nrep=4)
+        self.assertEqual(seashell_core.PreviewResolution(8, settings, 10000), (40, 1))
+        self.assertEqual(seashell_core.PreviewResolution(60, settings, 2000), (8, 1))
+
+    def testEmptyBudget(self):
+        for budget in (0, -5):
+            self.assertEqual(seashell_core.PreviewResolution(4, seashell_core.Settings(), budget), (3, 1))
+            self.assertEqual(seashell_core.PreviewResolution(30, seashell_core.Settings(), budget), (3, 10))
+
+
+class BudgetTest(unittest.TestCase):
+    def testCostMatchesSweep(self):
+        for cap in seashell_core.CAP_STYLES:
+            for adapt in (0.0, 0.02):
+                settings = seashell_core.Settings(nsid=12, nrep=3, cap=cap, adapt=adapt)
+                profile = CircleProfile(8)
+                sweep = seashell_core.BuildSweep(profile, settings)
+                cost = seashell_core.SweepCost(profile, settings)
+                faces = seashell_core.SweepFaces(sweep)
+                self.assertEqual(cost.points, len(sweep.positions))
+                self.assertEqual(cost.polygons, sum(len(indices) for indices, uvs in faces))
+                self.assertEqual(cost.uvs, sum(indices.size for indices, uvs in faces))
+
+    def testClamp(self):
+        jobs = [(CircleProfile(8), seashell_core.Settings(nsid=100, nrep=10))]
+        settings, cost, message = seashell_core.ApplyBudget(jobs, seashell_core.Budget(2000, 'clamp'))
+        self.assertLessEqual(cost.points, 2000)
+        self.assertLess(settings[0].nsid, 100)
+        self.assertIsNotNone(message)
+
+    def testClampKeepsFewerSides(self):
+        jobs = [(CircleProfile(8), seashell_core.Settings(nsid=2, nrep=10)),
+                (CircleProfile(8), seashell_core.Settings(nsid=100, nrep=10))]
+        settings, cost, message = seashell_core.ApplyBudget(jobs, seashell_core.Budget(4000, 'clamp'))
+        self.assertEqual(settings[0].nsid, 2)
+        self.assertLess(settings[1].nsid, 100)
+        self.assertLessEqual(cost.points, 4000)
+
+    def testClampBelowFloor(self):
+        jobs = [(CircleProfile(8), seashell_core.Settings(nsid=100, nrep=10))]
+        with self.assertRaises(seashell_core.BudgetExceeded):
+            seashell_core.ApplyBudget(jobs, seashell_core.Budget(10, 'clamp'))
+
+
+if __name__ == "__main__":
+    unittest.main()